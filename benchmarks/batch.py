@@ -0,0 +1,61 @@
+# Throughput of the NumPy batch classifier against check_winner, one board
+# at a time, on positions from random games for each board size. Every
+# batch result is checked against check_winner.
+#
+#     python benchmarks/batch.py [--boards N]
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tictactoe_core.batch import classify, random_positions, RESULT_NAMES
+from tictactoe_core.bitboard import BitBoard
+
+
+def to_bitboard(row, size):
+    x = o = 0
+    for index, cell in enumerate(row.tolist()):
+        if cell == 1:
+            x |= 1 << index
+        elif cell == -1:
+            o |= 1 << index
+    return BitBoard(size, x, o)
+
+
+def measure(size, count, seed):
+    cells = random_positions(count, size, seed)
+    boards = [to_bitboard(row, size) for row in cells]
+
+    start = time.perf_counter()
+    expected = [board.winner() for board in boards]
+    loop_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = classify(cells)
+    batch_elapsed = time.perf_counter() - start
+
+    mismatches = sum(RESULT_NAMES[code] != winner for code, winner in zip(results.tolist(), expected))
+    return count / loop_elapsed, count / batch_elapsed, mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare batch classification with check_winner")
+    parser.add_argument("--boards", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"{'size':>4} {'loop boards/s':>14} {'batch boards/s':>15} {'speedup':>8} {'mismatches':>11}")
+    failed = False
+    for size in range(3, 9):
+        loop_rate, batch_rate, mismatches = measure(size, args.boards, args.seed)
+        failed |= mismatches > 0
+        print(f"{size:>4} {loop_rate:>14,.0f} {batch_rate:>15,.0f} {batch_rate / loop_rate:>7.1f}x {mismatches:>11}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
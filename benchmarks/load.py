@@ -0,0 +1,308 @@
+# Load test: many players at once on one app server.
+#
+# Starts the app with `streamlit run` and connects N websocket clients that
+# speak the browser's protobuf messages: each one sets the board size and
+# AI opponent, clicks random empty cells on the board component, presses
+# "Play Again" when a game ends and plays --games games. Claude's side is
+# answered by the stub Messages API (tictactoe_core.stub_server) with the
+# given latency and error rate, so no API key or network is used. For each
+# number of sessions it reports script runs/sec, the AI turn latency (from
+# a click to the board showing the reply) at p50/p95/p99, errors, the
+# server's resident memory and what one session reports under "Session
+# Memory". Like the browser, clients rerun fragments that ask for it
+# (st.fragment(run_every=...)), which is how the page picks up a Claude
+# move worked out in the background; --blocking turns that option off.
+#
+#     python benchmarks/load.py --sessions 1,10,50 --games 2 --latency 0.5 --error-rate 0.05
+#
+# Needs the websockets package: pip install -r benchmarks/requirements.txt
+#
+# The default 5x5 board is past the opening book, so Claude is asked for
+# every move that is not forced.
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import websockets
+from streamlit.proto.Alert_pb2 import Alert
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+from tictactoe_core import stub_server
+
+APP_PATH = os.path.join(ROOT, "tictactoe.py")
+
+# Script runs that leave the page waiting for the player (anything else is
+# followed by another run)
+SETTLED = (ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY)
+
+# Seconds a client waits for the next message before giving up on its session
+RUN_TIMEOUT = 120
+
+# Seconds to wait for the server to come up
+STARTUP_TIMEOUT = 60
+
+# Labels of the widgets the clients set
+SIZE_LABEL = "Board Size:"
+AI_MODE_LABEL = "AI opponent:"
+STREAM_LABEL = "Stream Claude's responses"
+BACKGROUND_LABEL = "Keep the page responsive while Claude thinks"
+PLAY_AGAIN_LABEL = "Play Again"
+SESSION_MEMORY_LABEL = "This session"
+
+
+class Player:
+    # One simulated browser session
+    def __init__(self, url, rng, size, ai_mode, stream, background):
+        self.url = url
+        self.rng = rng
+        self.size = size
+        self.ai_mode = ai_mode
+        self.stream = stream
+        self.background = background
+        self.query_string = ""
+        # Current value of every widget the client has set, by widget id, sent
+        # with each run as a browser does
+        self.states = {}
+        self.widgets = {}
+        self.board = None
+        self.play_again = None
+        # Seconds between reruns, by id of the fragments that asked for them
+        self.auto_reruns = {}
+        self.session_kib = None
+        self.runs = 0
+        self.errors = 0
+        self.turns = []
+        # When the AI's turn started, and the marks on the board before its move
+        self.turn_start = None
+        self.marks_before = 0
+
+    def read_delta(self, delta):
+        if delta.WhichOneof("type") != "new_element":
+            return
+        element = delta.new_element
+        kind = element.WhichOneof("type")
+        if kind == "component_instance":
+            args = json.loads(element.component_instance.json_args)
+            self.board = (element.component_instance.id, delta.fragment_id, args["cells"], args["clickable"])
+        elif kind in ("number_input", "radio", "checkbox"):
+            widget = getattr(element, kind)
+            self.widgets[widget.label] = widget.id
+        elif kind == "button" and element.button.label == PLAY_AGAIN_LABEL:
+            self.play_again = element.button.id
+        elif kind == "metric" and element.metric.label == SESSION_MEMORY_LABEL:
+            self.session_kib = float(element.metric.body.split()[0])
+        elif kind == "exception" or (kind == "alert" and element.alert.format == Alert.ERROR):
+            self.errors += 1
+
+    async def run_script(self, ws, trigger=None, fragment_id="", is_auto_rerun=False):
+        # Ask for a run, as a widget change or fragment timer in the browser
+        # would, and read messages until the page waits for the player again
+        message = BackMsg()
+        client_state = message.rerun_script
+        client_state.query_string = self.query_string
+        client_state.fragment_id = fragment_id
+        client_state.is_auto_rerun = is_auto_rerun
+        for state in self.states.values():
+            client_state.widget_states.widgets.append(state)
+        if trigger is not None:
+            client_state.widget_states.widgets.append(WidgetState(id=trigger, trigger_value=True))
+        self.play_again = None
+        await ws.send(message.SerializeToString())
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await asyncio.wait_for(ws.recv(), RUN_TIMEOUT))
+            kind = forward.WhichOneof("type")
+            if kind == "delta":
+                self.read_delta(forward.delta)
+            elif kind == "new_session" and not forward.new_session.fragment_ids_this_run:
+                # A full run registers its fragment timers again
+                self.auto_reruns.clear()
+            elif kind == "auto_rerun":
+                self.auto_reruns[forward.auto_rerun.fragment_id] = forward.auto_rerun.interval
+            elif kind == "stop_auto_rerun":
+                for stopped in forward.stop_auto_rerun.fragment_ids:
+                    self.auto_reruns.pop(stopped, None)
+            elif kind == "page_info_changed":
+                self.query_string = forward.page_info_changed.query_string
+            elif kind == "script_finished":
+                self.runs += 1
+                if forward.script_finished in SETTLED:
+                    break
+                if forward.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    raise RuntimeError("the app failed to compile")
+        if self.turn_start is not None and self.marks() > self.marks_before:
+            self.turns.append(time.perf_counter() - self.turn_start)
+            self.turn_start = None
+
+    def start_turn(self, marks_before):
+        # The AI's turn starts now; it ends when the board has more marks
+        self.turn_start = time.perf_counter()
+        self.marks_before = marks_before
+
+    def marks(self):
+        return sum(cell != " " for cell in self.board[2]) if self.board else 0
+
+    async def play(self, games):
+        async with websockets.connect(self.url, subprotocols=["streamlit"], max_size=None) as ws:
+            await self.run_script(ws)
+            for label, value in ((SIZE_LABEL, {"double_value": self.size}),
+                                 (AI_MODE_LABEL, {"string_value": self.ai_mode}),
+                                 (STREAM_LABEL, {"bool_value": self.stream}),
+                                 (BACKGROUND_LABEL, {"bool_value": self.background})):
+                widget_id = self.widgets[label]
+                self.states[widget_id] = WidgetState(id=widget_id, **value)
+            self.start_turn(self.marks())
+            await self.run_script(ws)
+
+            finished = 0
+            while True:
+                board_id, fragment_id, cells, clickable = self.board
+                if self.play_again is not None:
+                    finished += 1
+                    if finished == games:
+                        return
+                    self.start_turn(0)
+                    await self.run_script(ws, self.play_again, fragment_id)
+                elif clickable:
+                    cell = self.rng.choice([index for index, mark in enumerate(cells) if mark == " "])
+                    click = json.dumps({"cell": cell, "id": uuid.uuid4().hex})
+                    self.states[board_id] = WidgetState(id=board_id, json_value=click)
+                    self.start_turn(self.marks() + 1)
+                    await self.run_script(ws, fragment_id=fragment_id)
+                elif self.auto_reruns:
+                    # Waiting for the AI: rerun the polling fragment when its timer fires
+                    polled, interval = next(iter(self.auto_reruns.items()))
+                    await asyncio.sleep(interval)
+                    await self.run_script(ws, fragment_id=polled, is_auto_rerun=True)
+                else:
+                    # Neither the player's turn nor over, e.g. after an error: reload
+                    self.errors += 1
+                    await self.run_script(ws)
+
+
+def percentile(values, fraction):
+    # Nearest-rank percentile of a non-empty list
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_mib(pid):
+    # Resident memory of a process, from /proc (Linux only)
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def start_app(port, stub_url):
+    env = dict(os.environ, ANTHROPIC_API_KEY="load-test", ANTHROPIC_BASE_URL=stub_url)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP_PATH, "--server.headless=true",
+         f"--server.port={port}", "--browser.gatherUsageStats=false"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.perf_counter() + STARTUP_TIMEOUT
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("the app server did not start")
+
+
+async def run_players(players, games):
+    results = await asyncio.gather(*(player.play(games) for player in players), return_exceptions=True)
+    return sum(isinstance(result, Exception) for result in results)
+
+
+def measure(sessions, args):
+    # Play with `sessions` players at once on a fresh server
+    stub = stub_server.start(latency=args.latency, seed=args.seed, error_rate=args.error_rate)
+    port = free_port()
+    app = start_app(port, stub.url)
+    try:
+        url = f"ws://127.0.0.1:{port}/_stcore/stream"
+        players = [
+            Player(url, random.Random(args.seed * 1000 + number), args.size, args.mode,
+                   not args.no_stream, not args.blocking)
+            for number in range(sessions)
+        ]
+        start = time.perf_counter()
+        failed = asyncio.run(run_players(players, args.games))
+        elapsed = time.perf_counter() - start
+        memory = rss_mib(app.pid)
+    finally:
+        app.terminate()
+        app.wait()
+        stub.shutdown()
+
+    turns = [seconds for player in players for seconds in player.turns]
+    kib = [player.session_kib for player in players if player.session_kib is not None]
+    return {
+        "runs_per_sec": sum(player.runs for player in players) / elapsed,
+        "turns": turns,
+        "errors": sum(player.errors for player in players) + failed,
+        "api_calls": stub.requests,
+        "api_errors": stub.errors,
+        "rss_mib": memory,
+        "session_kib": sum(kib) / len(kib) if kib else None,
+    }
+
+
+def parse_ints(text):
+    return [int(value) for value in text.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play many sessions at once against one app server")
+    parser.add_argument("--sessions", type=parse_ints, default=[1, 5, 10], help="comma-separated session counts")
+    parser.add_argument("--games", type=int, default=1, help="games per session")
+    parser.add_argument("--size", type=int, default=5, help="board size")
+    parser.add_argument("--mode", default="Claude", help="AI opponent, as labelled in the options")
+    parser.add_argument("--no-stream", action="store_true", help="ask Claude for complete replies")
+    parser.add_argument("--blocking", action="store_true", help="wait for Claude inside the script run")
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds the stub API waits before replying")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of API requests failed with 529")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"{'sessions':>8} {'runs/s':>7} {'turns':>6} {'p50 s':>6} {'p95 s':>6} {'p99 s':>6} "
+          f"{'errors':>6} {'API':>5} {'529s':>5} {'RSS MiB':>8} {'KiB/session':>11}")
+    for sessions in args.sessions:
+        result = measure(sessions, args)
+        turns = result["turns"]
+        latency = " ".join(f"{percentile(turns, fraction):>6.2f}" if turns else f"{'-':>6}" for fraction in (0.5, 0.95, 0.99))
+        rss = f"{result['rss_mib']:>8.0f}" if result["rss_mib"] is not None else f"{'-':>8}"
+        kib = f"{result['session_kib']:>11.1f}" if result["session_kib"] is not None else f"{'-':>11}"
+        print(f"{sessions:>8} {result['runs_per_sec']:>7.1f} {len(turns):>6} {latency} "
+              f"{result['errors']:>6} {result['api_calls']:>5} {result['api_errors']:>5} {rss} {kib}")
+
+
+if __name__ == "__main__":
+    main()
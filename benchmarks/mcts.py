@@ -0,0 +1,68 @@
+# Playouts per second of the Monte Carlo engine as worker processes are
+# added, on mid-game positions for each board size. Every worker count uses
+# the same pool, started once before timing, as the app does.
+#
+#     python benchmarks/mcts.py [--sizes 6,7,8] [--workers 1,2,4] [--budget 1.0]
+
+import argparse
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tictactoe_core.game import Game
+from tictactoe_core.mcts import create_pool, find_mcts_move
+from tictactoe_core.tactics import completing_cells
+
+
+def midgame(size, seed):
+    # A sixth of the cells played at random, X to move, with no line that
+    # either player could complete on the next move, so playouts do not end
+    # at once
+    rng = random.Random(seed)
+    game = Game(size, human_marker="X", first_player="X")
+    while game.board.empty > size * size * 5 // 6 or game.current_player != "X":
+        index = rng.choice(game.board.empty_cells())
+        game.board.play(index, game.current_player)
+        if completing_cells(game.board.x, game.board.o, size) or completing_cells(game.board.o, game.board.x, size):
+            game.board.undo(index)
+        else:
+            game.current_player = "O" if game.current_player == "X" else "X"
+    return game
+
+
+def parse_ints(text):
+    return [int(value) for value in text.split(",")]
+
+
+def main(argv=None):
+    cores = os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1))) or [1]
+    parser = argparse.ArgumentParser(description="Measure Monte Carlo playouts/sec per worker count")
+    parser.add_argument("--sizes", type=parse_ints, default=[6, 7, 8])
+    parser.add_argument("--workers", type=parse_ints, default=default_workers,
+                        help=f"comma-separated worker counts (default: up to the {cores} cores)")
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds per search")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    pool = create_pool(max(args.workers))
+    try:
+        print(f"{cores} cores")
+        print(f"{'size':>4} {'workers':>7} {'playouts/s':>11} {'speedup':>8} {'move':>5}")
+        for size in args.sizes:
+            board = midgame(size, args.seed).board
+            single = None
+            for workers in args.workers:
+                result = find_mcts_move(board, "X", args.budget, pool, workers, args.seed)
+                rate = result.playouts / result.elapsed
+                single = single or rate
+                print(f"{size:>4} {workers:>7} {rate:>11,.0f} {rate / single:>7.1f}x {result.move:>5}")
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Render cost of the app for each board size: time for a full script run,
+# the number and serialized size of the elements sent to the browser, and
+# the time spent in the board and options fragments. A click on the board
+# used to cost a full run; it now reruns only the board fragment.
+#
+#     python benchmarks/render.py [--runs N]
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# AppTest runs the script without a browser session; silence the warnings about it
+logging.disable(logging.WARNING)
+
+from streamlit.testing.v1 import AppTest
+
+from tictactoe_core.game import Game
+
+APP_PATH = os.path.join(ROOT, "tictactoe.py")
+
+
+def _elements(node):
+    yield node
+    children = getattr(node, "children", None)
+    if isinstance(children, dict):
+        for child in children.values():
+            yield from _elements(child)
+
+
+def payload(at):
+    # (element count, serialized bytes) of everything the run rendered
+    count = size = 0
+    for node in _elements(at._tree):
+        proto = getattr(node, "proto", None)
+        if proto is not None:
+            count += 1
+            size += len(proto.SerializeToString())
+    return count, size
+
+
+def measure(size, runs):
+    os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    # Human to move on a half-empty board, so every empty cell is clickable
+    game = Game(size, human_marker="X", first_player="X")
+    for index in range(0, size * size // 2, 3):
+        game.board.play(index, "X" if index % 2 else "O")
+    # The first run creates the session; the measured runs play on this game
+    at.run()
+    at.session_state["session"].game = game
+    at.run()
+
+    start = time.perf_counter()
+    sections = {}
+    for _ in range(runs):
+        at.run()
+        for section, ms in at.session_state["session"].render_timings.items():
+            sections[section] = sections.get(section, 0.0) + ms / runs
+    elapsed = (time.perf_counter() - start) / runs
+    return elapsed, payload(at), sections
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure render time and payload per board size")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--sizes", type=lambda text: [int(size) for size in text.split(",")], default=list(range(3, 9)),
+                        help="comma-separated board sizes (default: 3-8)")
+    args = parser.parse_args(argv)
+
+    print(f"{'size':>4} {'rerun ms':>9} {'board ms':>9} {'options ms':>11} {'elements':>9} {'bytes':>7}")
+    for size in args.sizes:
+        elapsed, (count, nbytes), sections = measure(size, args.runs)
+        print(
+            f"{size:>4} {elapsed * 1000:>9.1f} {sections.get('board', 0.0):>9.1f} "
+            f"{sections.get('options', 0.0):>11.1f} {count:>9} {nbytes:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
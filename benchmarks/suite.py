@@ -0,0 +1,265 @@
+# Offline benchmark suite with stored baselines.
+#
+# Times the hot paths for every board size from 3 to 8:
+#   check_winner  full board.winner() and winner_at() for every occupied cell
+#   parse_text    free-text replies (recorded in data/claude_responses.json)
+#                 through parse_response and the streaming parser
+#   parse_tool    recorded place_mark tool calls through the tool reader
+#   resize        Game.resize() to the next size and back
+#   move          playing a cell with its win and threat checks, then undoing
+#                 it (pass larger --sizes to see it stay flat up to 19)
+#   state_codec   encoding a game for its URL and decoding it again
+#   position_key  the move cache's symmetry-canonical key for a position
+#   render        a full AppTest rerun of the app (see render.py)
+#
+# Results are compared with baselines.json and the run fails when a case is
+# still slower than its baseline by more than the threshold after being
+# measured a second time. Baselines depend on
+# the machine, so record them where the suite runs:
+#
+#     python benchmarks/suite.py                     # compare with baselines
+#     python benchmarks/suite.py --update-baselines  # record new baselines
+#     python benchmarks/suite.py --cases parse_text,resize --threshold 0.5
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tictactoe_core.claude_player import PLACE_MARK_TOOL, build_request, _read_tool_reply
+from tictactoe_core.game import Game
+from tictactoe_core.threats import threats_at
+from tictactoe_core.move_cache import MoveCache
+from tictactoe_core.response_parser import StreamingMoveParser, parse_response
+from tictactoe_core import state_codec
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCH_DIR, "baselines.json")
+RESPONSES_PATH = os.path.join(BENCH_DIR, "data", "claude_responses.json")
+
+SIZES = range(3, 9)
+DEFAULT_THRESHOLD = float(os.getenv("BENCH_THRESHOLD", 0.25))
+
+# Characters per chunk when replaying a reply through the streaming parser
+STREAM_CHUNK = 8
+
+
+def midgame(size):
+    # A game with about a third of the cells played, X to move
+    game = Game(size, human_marker="X", first_player="X")
+    for index in range(0, size * size, 3):
+        game.board.play(index, "X" if index % 2 else "O")
+    return game
+
+
+def time_per_call(fn, repeat=5):
+    # Best of `repeat` rounds, each long enough to time reliably, in seconds per call
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def load_responses(board):
+    # Recorded replies with {move} set to an empty cell and {other} to a taken one
+    with open(RESPONSES_PATH) as f:
+        responses = json.load(f)
+    empty_cells = board.empty_cells()
+    taken = [index for index in range(len(board)) if not board.is_empty(index)]
+    values = {"move": str(empty_cells[len(empty_cells) // 2]), "other": str(taken[0] if taken else 0)}
+
+    def fill(text):
+        return text.replace("{move}", values["move"]).replace("{other}", values["other"])
+
+    text = [fill(reply) for reply in responses["text"]]
+    tool = [{key: fill(value) for key, value in call.items()} for call in responses["tool"]]
+    for call in tool:
+        call["position"] = int(call["position"])
+    return text, tool
+
+
+def bench_check_winner(size):
+    board = midgame(size).board
+    occupied = [index for index in range(len(board)) if not board.is_empty(index)]
+
+    def run():
+        board.winner()
+        for index in occupied:
+            board.winner_at(index)
+    return time_per_call(run)
+
+
+def bench_parse_text(size):
+    board = midgame(size).board
+    replies, _ = load_responses(board)
+    chunked = [[reply[i:i + STREAM_CHUNK] for i in range(0, len(reply), STREAM_CHUNK)] for reply in replies]
+
+    def run():
+        for reply in replies:
+            parse_response(reply, board)
+        for chunks in chunked:
+            parser = StreamingMoveParser(board)
+            for chunk in chunks:
+                if parser.feed(chunk) is not None:
+                    break
+            parser.finish()
+    return time_per_call(run)
+
+
+def bench_parse_tool(size):
+    from anthropic.types import Message
+
+    board = midgame(size).board
+    _, calls = load_responses(board)
+    request = build_request(board, "X", "O")
+    messages = [
+        Message.model_validate({
+            "id": f"msg_recorded_{index}",
+            "type": "message",
+            "role": "assistant",
+            "model": request["model"],
+            "content": [{"type": "tool_use", "id": f"toolu_recorded_{index}",
+                         "name": PLACE_MARK_TOOL["name"], "input": call}],
+            "stop_reason": "tool_use",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 900, "output_tokens": 40,
+                      "cache_creation_input_tokens": 0, "cache_read_input_tokens": 850},
+        })
+        for index, call in enumerate(calls)
+    ]
+
+    def run():
+        for message in messages:
+            # Valid positions never re-ask, so no client is needed
+            _read_tool_reply(None, request, message, board)
+    return time_per_call(run)
+
+
+def bench_resize(size):
+    game = midgame(size)
+
+    def run():
+        game.resize(size + 1)
+        game.resize(size)
+    return time_per_call(run)
+
+
+def bench_move(size):
+    board = midgame(size).board
+    index = board.empty_cells()[0]
+
+    def run():
+        board.play(index, "X")
+        board.winner_at(index)
+        threats_at(board, index)
+        board.undo(index)
+    return time_per_call(run)
+
+
+def bench_state_codec(size):
+    game = midgame(size)
+    key = b"benchmark"
+
+    def run():
+        state_codec.decode(state_codec.encode(game, key), key)
+    return time_per_call(run)
+
+
+def bench_position_key(size):
+    board = midgame(size).board
+
+    def run():
+        MoveCache._key(board, "O")
+    return time_per_call(run)
+
+
+def bench_render(size, repeat=3):
+    from render import measure
+    return min(measure(size, runs=5)[0] for _ in range(repeat))
+
+
+CASES = {
+    "check_winner": bench_check_winner,
+    "parse_text": bench_parse_text,
+    "parse_tool": bench_parse_tool,
+    "resize": bench_resize,
+    "move": bench_move,
+    "state_codec": bench_state_codec,
+    "position_key": bench_position_key,
+    "render": bench_render,
+}
+
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def run(cases, sizes, baselines, threshold, out=sys.stdout):
+    # Time every case and size; returns (results in microseconds, regressions)
+    results = {}
+    regressions = []
+    print(f"{'case':<13} {'size':>4} {'us/call':>10} {'baseline':>10} {'change':>8}", file=out)
+    for case in cases:
+        for size in sizes:
+            key = f"{case}/{size}"
+            micros = CASES[case](size) * 1e6
+            results[key] = micros
+            baseline = baselines.get(key)
+            if baseline is None:
+                print(f"{case:<13} {size:>4} {micros:>10.1f} {'-':>10} {'-':>8}", file=out)
+                continue
+            if micros / baseline - 1 > threshold:
+                # Measure once more before calling it a regression, so one
+                # noisy round does not fail the run
+                micros = results[key] = min(micros, CASES[case](size) * 1e6)
+            change = micros / baseline - 1
+            flag = ""
+            if change > threshold:
+                regressions.append(key)
+                flag = "  SLOWER"
+            print(f"{case:<13} {size:>4} {micros:>10.1f} {baseline:>10.1f} {change:>+8.0%}{flag}", file=out)
+    return results, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite")
+    parser.add_argument("--cases", type=lambda text: text.split(","), default=list(CASES),
+                        help=f"comma-separated cases from {', '.join(CASES)}")
+    parser.add_argument("--sizes", type=lambda text: [int(size) for size in text.split(",")], default=list(SIZES))
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown over the baseline, as a fraction (default 0.25)")
+    parser.add_argument("--baselines", default=BASELINE_PATH)
+    parser.add_argument("--update-baselines", action="store_true",
+                        help="store these results as the new baselines instead of comparing")
+    args = parser.parse_args(argv)
+
+    unknown = [case for case in args.cases if case not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+
+    baselines = load_baselines(args.baselines)
+    if args.update_baselines:
+        results, _ = run(args.cases, args.sizes, {}, args.threshold)
+        baselines.update({key: round(micros, 3) for key, micros in results.items()})
+        with open(args.baselines, "w") as f:
+            json.dump(dict(sorted(baselines.items())), f, indent=2)
+            f.write("\n")
+        print(f"Baselines written to {args.baselines}")
+        return 0
+
+    _, regressions = run(args.cases, args.sizes, baselines, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}: "
+              f"{', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
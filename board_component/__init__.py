@@ -0,0 +1,22 @@
+# The game board as a single Streamlit component.
+#
+# The whole board is drawn by one iframe from a compact string of cells
+# instead of a Streamlit widget per cell, and the component sends back the
+# index of the clicked cell. The frontend is plain HTML and JavaScript
+# speaking the component message protocol, so there is nothing to build.
+
+import os
+
+import streamlit.components.v1 as components
+
+_FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend")
+
+_component = components.declare_component("tictactoe_board", path=_FRONTEND_DIR)
+
+
+def board(cells, size, clickable, key=None):
+    # Draw the board and return the latest click as {"cell": index, "id": click_id},
+    # or None before the first click. `cells` is a string with one character
+    # per cell ("X", "O" or " "). Each click carries a new id, so callers can
+    # tell a fresh click from the value repeated on later reruns.
+    return _component(cells=cells, size=size, clickable=clickable, key=key, default=None)
@@ -0,0 +1,62 @@
+from tictactoe_core.game import Game, TIE
+
+
+def test_lowering_win_length_ends_game_with_existing_line():
+    game = Game(4, human_marker="X", first_player="X", win_length=4)
+    for index in (0, 4, 1, 5, 2):
+        assert game.make_move(index)
+    assert not game.game_over
+
+    game.set_win_length(3)
+
+    assert game.game_over
+    assert game.winner == "X"
+    assert (game.human_score, game.ai_score, game.ties) == (1, 0, 0)
+    assert not game.make_move(3)
+
+
+def test_shrinking_board_ends_game_with_existing_line():
+    game = Game(5, human_marker="X", first_player="O", win_length=4)
+    for index in (0, 20, 1, 21, 2):
+        assert game.make_move(index)
+    assert not game.game_over
+
+    # 3x3 keeps the top row and plays three in a row
+    game.resize(3)
+
+    assert game.game_over
+    assert game.winner == "O"
+    assert (game.human_score, game.ai_score, game.ties) == (0, 1, 0)
+
+
+def test_rebuild_without_line_keeps_playing():
+    game = Game(4, human_marker="X", first_player="X", win_length=4)
+    for index in (0, 5, 1):
+        game.make_move(index)
+
+    game.set_win_length(3)
+
+    assert not game.game_over
+    assert game.winner is None
+    assert game.current_player == "O"
+
+
+def test_rebuild_of_finished_game_keeps_result():
+    game = Game(3, human_marker="X", first_player="X", win_length=3)
+    for index in (0, 3, 1, 4, 2):
+        game.make_move(index)
+    assert game.winner == "X"
+
+    game.resize(4)
+
+    assert game.winner == "X"
+    assert game.human_score == 1
+    assert game.ties == 0
+
+
+def test_tie_is_a_result():
+    game = Game(3, human_marker="X", first_player="X", win_length=3)
+    for index in (0, 1, 2, 4, 3, 5, 7, 6, 8):
+        game.make_move(index)
+    assert game.winner == TIE
+    assert game.ties == 1
@@ -0,0 +1,41 @@
+from tictactoe_core.bitboard import BitBoard
+from tictactoe_core.search import WIN_SCORE, find_best_move
+
+
+def test_win_found_in_narrowed_search_is_not_complete():
+    # Open three on 8x8: the win is found, but cells far from the marks
+    # were never tried
+    board = BitBoard(8, win_length=4)
+    for index in (27, 28, 29):
+        board.play(index, "X")
+    for index in (0, 7):
+        board.play(index, "O")
+
+    result = find_best_move(board, "X", time_budget=10.0, max_depth=3)
+
+    assert result.score >= WIN_SCORE
+    assert not result.complete
+
+
+def test_full_width_search_on_large_board_is_complete():
+    # Every empty cell is near a mark, so nothing is left out
+    board = BitBoard(5, win_length=4)
+    for turn, index in enumerate((0, 1, 2, 5, 6, 7, 10, 11, 12, 13, 15, 16, 18, 20, 24)):
+        board.play(index, "XO"[turn % 2])
+
+    result = find_best_move(board, "X", time_budget=10.0)
+
+    assert result.complete
+
+
+def test_empty_large_board_is_never_complete():
+    result = find_best_move(BitBoard(5, win_length=4), "X", time_budget=0.2, max_depth=2)
+
+    assert not result.complete
+
+
+def test_small_board_search_is_complete():
+    result = find_best_move(BitBoard(3), "X", time_budget=10.0)
+
+    assert result.complete
+    assert result.score == 0
@@ -6,28 +6,49 @@ st.set_page_config(
     layout="centered"
 )
 
-import streamlit.components.v1 as components
-import random
 import time
 import os
 import base64
+import secrets
 from dotenv import load_dotenv
-import anthropic
+from tictactoe_core.game import Game
+from tictactoe_core.bitboard import MIN_SIZE, MAX_SIZE, MIN_WIN_LENGTH
+from board_component import board as board_component
+from tictactoe_core.search import find_best_move, WIN_SCORE
+from tictactoe_core.mcts import find_mcts_move, create_pool
+from tictactoe_core import opening_book
+from tictactoe_core.move_cache import MoveCache, DEFAULT_MAX_ENTRIES
+from tictactoe_core.speculation import Speculator, create_executor
+from tictactoe_core.ai_worker import AIWorker
+from tictactoe_core.tactics import forced_move
+from tictactoe_core.claude_player import PROTOCOL_TOOL, PROTOCOL_TEXT
+from tictactoe_core.provider import get_provider, peek_provider, CircuitOpenError, DEGRADED_STRATEGIES, DEGRADED_STRATEGY
+from tictactoe_core.metrics import Metrics, to_prometheus, to_jsonl, write_prometheus, append_jsonl
+from tictactoe_core import state_codec
+from tictactoe_core.session import Session, LatencySample, MoveNote
 
-# Set up cell click handling with a component
-if 'clicked_cell' not in st.session_state:
-    st.session_state.clicked_cell = None
+# Start of this script run, for the render timings
+script_start = time.perf_counter()
 
-# Check URL parameters
-params = st.query_params
-if 'cell' in params:
-    try:
-        # Store the cell click in session state
-        st.session_state.clicked_cell = int(params['cell'])
-        # Clear URL parameters
-        params.clear()
-    except (ValueError, KeyError, IndexError):
-        pass
+# Who plays the AI's side
+AI_MODE_CLAUDE = "Claude"
+AI_MODE_LOCAL = "Local engine"
+AI_MODE_MCTS = "Monte Carlo engine"
+AI_MODE_FALLBACK = "Claude with local fallback"
+AI_MODES = [AI_MODE_CLAUDE, AI_MODE_LOCAL, AI_MODE_MCTS, AI_MODE_FALLBACK]
+
+# Modes that never call the API
+LOCAL_AI_MODES = (AI_MODE_LOCAL, AI_MODE_MCTS)
+
+# Worker processes for the Monte Carlo engine, one search tree each
+MCTS_WORKERS = int(os.getenv("MCTS_WORKERS", os.cpu_count() or 1))
+
+# Explanations for opening book moves, by game value for the AI
+BOOK_REASONING = {
+    opening_book.WIN: "Opening book: this move wins with best play.",
+    opening_book.DRAW: "Opening book: this move holds the draw with best play.",
+    opening_book.LOSS: "Opening book: every move loses against best play, so this one holds out the longest.",
+}
 
 # Try to load environment variables
 try:
@@ -38,461 +59,408 @@ except ImportError:
 # Initialize Anthropic client
 api_key = os.getenv("ANTHROPIC_API_KEY")
 
-# Set up session state
-if 'board_size' not in st.session_state:
-    st.session_state.board_size = 3
-if 'board' not in st.session_state:
-    st.session_state.board = [" " for _ in range(st.session_state.board_size**2)]
-if 'current_player' not in st.session_state:
-    st.session_state.current_player = random.choice(['X', 'O'])
-if 'human_marker' not in st.session_state:
-    st.session_state.human_marker = 'X'
-if 'ai_marker' not in st.session_state:
-    st.session_state.ai_marker = 'O'
-if 'game_over' not in st.session_state:
-    st.session_state.game_over = False
-if 'winner' not in st.session_state:
-    st.session_state.winner = None
-if 'game_count' not in st.session_state:
-    st.session_state.game_count = 1
-if 'human_score' not in st.session_state:
-    st.session_state.human_score = 0
-if 'ai_score' not in st.session_state:
-    st.session_state.ai_score = 0
-if 'ties' not in st.session_state:
-    st.session_state.ties = 0
-if 'ai_reasoning' not in st.session_state:
-    st.session_state.ai_reasoning = ""
-if 'ai_move_history' not in st.session_state:
-    st.session_state.ai_move_history = []
+# Query parameter that carries the signed game state
+STATE_PARAM = "g"
+
+# Key that signs game links. Every node must share the same STATE_SECRET to
+# resume each other's games; without it links only work on this process.
+@st.cache_resource
+def get_state_key():
+    secret = os.getenv("STATE_SECRET")
+    return secret.encode() if secret else secrets.token_bytes(32)
+
+# Shared pool for speculative Claude calls; its size caps how many run at once
+@st.cache_resource
+def get_speculation_executor():
+    return create_executor(int(os.getenv("SPECULATION_WORKERS", 4)))
+
+# Metrics for all sessions together; each session's metrics add up into these
+@st.cache_resource
+def get_process_metrics():
+    return Metrics()
+
+# Timing spans and counters. Collection starts on for new sessions when
+# METRICS_ENABLED is set, and can be switched per session in the options.
+# Process totals are written after each AI turn to the Prometheus textfile
+# and/or JSONL file given here.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "").lower() in ("1", "true", "yes")
+METRICS_PROM_PATH = os.getenv("METRICS_PROM_PATH")
+METRICS_JSONL_PATH = os.getenv("METRICS_JSONL_PATH")
+
+# The game, the UI and AI settings, the histories and the metrics of this
+# browser session live in one Session. A new session resumes the game in
+# the link, if it has one.
+if 'session' not in st.session_state:
+    token = st.query_params.get(STATE_PARAM)
+    restored = None
+    if token:
+        try:
+            restored = state_codec.decode(token, get_state_key())
+        except state_codec.InvalidState:
+            st.toast("The game in this link could not be restored, so a new game was started.")
+    st.session_state.session = Session(
+        restored or Game(),
+        AI_MODE_CLAUDE,
+        Speculator(get_speculation_executor()),
+        Metrics(enabled=METRICS_ENABLED, parent=get_process_metrics())
+    )
+session = st.session_state.session
+
+# How Claude returns its move
+MOVE_PROTOCOLS = {"Tool call": PROTOCOL_TOOL, "Free text": PROTOCOL_TEXT}
+
+# Shortest AI turn, so instant replies still feel natural
+MIN_AI_TURN_SECONDS = 1.0
+
+# Seconds between checks for a Claude move worked out in the background
+AI_POLL_SECONDS = 0.5
+
+# Returned by get_ai_move when Claude's move is being worked out in the background
+PENDING = object()
+
+# Parts of the page with their own render timing
+RENDER_SECTIONS = {
+    'app': "Whole page",
+    'board': "Board",
+    'thoughts': "Claude's Thoughts",
+    'options': "Scoreboard and options",
+}
 
 # Title and API key input
 st.title("Tic Tac Toe vs Claude")
 
-# API key input
-if not api_key:
+# API key input (not needed when only the local engine plays)
+if not api_key and session.ai_mode not in LOCAL_AI_MODES:
     api_key = st.text_input("Enter your Anthropic API key:", type="password")
     if not api_key:
-        st.warning("Please enter your Anthropic API key to play.")
+        st.warning("Please enter your Anthropic API key to play, or play against the local engine instead.")
+        if st.button("Play against the local engine"):
+            session.ai_mode = AI_MODE_LOCAL
+            st.rerun()
         st.stop()
 
-# Initialize Anthropic client
-client = anthropic.Anthropic(api_key=api_key)
+game = session.game
+
+# Claude provider shared by every session using this API key (pooled client,
+# retries, circuit breaker). Created on the first Claude call, which is when
+# the Anthropic SDK gets imported.
+def claude_provider():
+    return get_provider(api_key)
+
+# Claude's answers are cached per process, optionally persisted to SQLite
+@st.cache_resource
+def get_move_cache():
+    return MoveCache(
+        max_entries=int(os.getenv("MOVE_CACHE_SIZE", DEFAULT_MAX_ENTRIES)),
+        db_path=os.getenv("MOVE_CACHE_PATH")
+    )
+
+move_cache = get_move_cache()
+
+# Event loop thread that keeps the Claude calls of every session in flight
+# without holding their script threads
+@st.cache_resource
+def get_ai_worker():
+    return AIWorker()
+
+# Process pool for the Monte Carlo engine, started on its first move and then
+# shared by every session, so workers are not started again on every turn
+@st.cache_resource
+def get_mcts_pool():
+    return create_pool(MCTS_WORKERS)
+
+metrics = session.metrics
 
 # Functions for the game
-def check_winner(board):
-    size = int(st.session_state.board_size)
-    win_length = 3  # Fixed win length of 3
-    
-    # Check rows
-    for row_start in range(0, size*size, size):
-        for col_start in range(size - win_length + 1):
-            segment = board[row_start + col_start:row_start + col_start + win_length]
-            if segment.count(segment[0]) == win_length and segment[0] != " ":
-                return segment[0]
-    
-    # Check columns
-    for col in range(size):
-        for row_start in range(size - win_length + 1):
-            segment = [board[(row_start + i) * size + col] for i in range(win_length)]
-            if segment.count(segment[0]) == win_length and segment[0] != " ":
-                return segment[0]
-    
-    # Check diagonals (top-left to bottom-right)
-    for row_start in range(size - win_length + 1):
-        for col_start in range(size - win_length + 1):
-            segment = [board[(row_start + i) * size + (col_start + i)] for i in range(win_length)]
-            if segment.count(segment[0]) == win_length and segment[0] != " ":
-                return segment[0]
-    
-    # Check diagonals (top-right to bottom-left)
-    for row_start in range(size - win_length + 1):
-        for col_start in range(win_length - 1, size):
-            segment = [board[(row_start + i) * size + (col_start - i)] for i in range(win_length)]
-            if segment.count(segment[0]) == win_length and segment[0] != " ":
-                return segment[0]
-    
-    # Check for tie
-    if " " not in board:
-        return "Tie"
-    
-    return None
-
-def get_ai_move(board, ai_marker, human_marker):
-    size = st.session_state.board_size
-    # Format the board state for Claude
-    board_str = ""
-    separator = "-" + "-+-".join(["-" for _ in range(size-1)]) + "-"
-    
-    for i in range(size):
-        row = "|".join(board[i*size:(i+1)*size])
-        board_str += f"    {row}\n"
-        if i < size - 1:
-            board_str += f"    {separator}\n"
-    
-    # Generate the position numbers display
-    position_display = ""
-    for i in range(size):
-        row_positions = "|".join([str(i*size+j) for j in range(size)])
-        position_display += f"{row_positions}\n"
-        if i < size - 1:
-            position_display += f"{separator.strip()}\n"
-    
-    prompt = f"""
-    We're playing Tic Tac Toe on a {size}x{size} board. YOU are playing as '{ai_marker}' and I (the human) am playing as '{human_marker}'.
-    
-    IMPORTANT: To be absolutely clear:
-    - All '{ai_marker}' marks on the board are YOUR marks
-    - All '{human_marker}' marks on the board are MY marks (the human player)
-    - You can only win by getting 3 '{ai_marker}' marks in a row (not {size})
-    - I can only win by getting 3 '{human_marker}' marks in a row (not {size})
-    - You cannot use my '{human_marker}' marks to form your winning line
-    
-    CRITICAL: Take your time to carefully read and understand the current board state. 
-    Look at EACH position to identify ALL '{human_marker}' and '{ai_marker}' markers.
-    Check for potential winning lines of 3 in ALL directions (rows, columns, and diagonals).
-    
-    The current board state is:
-    
-{board_str}
-    
-    It's your turn. Make your move by placing another '{ai_marker}' mark on the board.
-    Choose the index number (0-{size*size-1}) of an empty position.
-    
-    The board positions are numbered as follows:
-{position_display}
-    
-    Please explain your reasoning in 1-2 sentences, then provide your move.
-    Format your response like this:
-    
-    [reasoning] I am choosing position X because... [/reasoning]
-    
-    X
-    
-    Where X is a single number 0-{size*size-1} representing an empty position on the board.
-    """
+
+def get_local_move(board, ai_marker):
+    with metrics.span("local_search"):
+        result = find_best_move(board, ai_marker, session.local_time_budget)
+    
+    # Describe the search in place of Claude's reasoning
+    if result.complete and result.score >= WIN_SCORE:
+        outcome = "This move leads to a forced win."
+    elif result.complete and result.score <= -WIN_SCORE:
+        outcome = "Every move loses against best play, so this one holds out the longest."
+    elif result.complete:
+        outcome = "With best play from both sides this game is a tie."
+    else:
+        outcome = "This move scored best in the time available."
+    session.ai_reasoning = (
+        f"Local engine searched {result.depth} moves ahead "
+        f"({result.nodes} positions in {result.elapsed:.2f}s). {outcome}"
+    )
+    return result.move
+
+def get_mcts_move(board, ai_marker):
+    pool = get_mcts_pool()
+    with metrics.span("mcts_search"):
+        result = find_mcts_move(board, ai_marker, session.local_time_budget, pool, MCTS_WORKERS)
+    metrics.count("mcts_playouts", result.playouts)
+    
+    # Describe the search in place of Claude's reasoning
+    session.ai_reasoning = (
+        f"Monte Carlo engine played {result.playouts:,} random games from here "
+        f"on {result.workers} processes in {result.elapsed:.2f}s. "
+        f"This move was tried most ({result.visits:,} games) and won {result.win_rate:.0%} of them."
+    )
+    return result.move
+
+def get_ai_move(board, ai_marker, human_marker, live_thought=None):
+    # Positions in the opening book have a known best reply
+    if session.use_opening_book:
+        with metrics.span("opening_book"):
+            book_entry = opening_book.lookup(board, ai_marker)
+        if book_entry is not None:
+            metrics.count("opening_book_hits")
+            move, value = book_entry
+            session.ai_reasoning = BOOK_REASONING[value]
+            return move
+    
+    mode = session.ai_mode
+    
+    # Play forced moves (last cell, immediate win, single block) without thinking
+    with metrics.span("forced_move"):
+        forced = forced_move(board, ai_marker)
+    if forced is not None:
+        metrics.count("forced_moves")
+        move, reasoning = forced
+        session.ai_reasoning = reasoning
+        if mode not in LOCAL_AI_MODES:
+            session.api_calls_saved += 1
+        return move
+    
+    if mode == AI_MODE_LOCAL:
+        return get_local_move(board, ai_marker)
+    if mode == AI_MODE_MCTS:
+        return get_mcts_move(board, ai_marker)
+    
+    # Reuse Claude's answer if this position (or a rotation/reflection of it) was asked before
+    with metrics.span("move_cache"):
+        cached = move_cache.get(board, ai_marker)
+    metrics.count("move_cache_hits" if cached is not None else "move_cache_misses")
+    if cached is not None:
+        move, reasoning = cached
+        session.ai_reasoning = reasoning
+        return move
+    
+    # Use the reply worked out while the human was deciding, if there is one
+    if session.speculate:
+        with metrics.span("speculation_wait"):
+            speculated = session.speculator.take(board, ai_marker)
+        hit = speculated is not None and speculated.move is not None
+        metrics.count("speculation_hits" if hit else "speculation_misses")
+        if hit:
+            session.ai_reasoning = speculated.reasoning
+            move_cache.put(board, ai_marker, speculated.move, speculated.reasoning)
+            return speculated.move
+    
+    # Ask on the background worker; ai_turn_poller plays the move when it arrives
+    if session.background_turns:
+        session.ai_reasoning = ""
+        session.ai_job = get_ai_worker().request_move(
+            claude_provider(), board, ai_marker, human_marker,
+            session.move_protocol, session.stream_responses
+        )
+        return PENDING
     
+    return play_claude_reply(board, ai_marker, lambda: get_claude_move(board, ai_marker, human_marker, live_thought))
+
+def play_claude_reply(board, ai_marker, ask):
+    # The move ask() gets from Claude, cached for next time, or a local move
+    # if Claude fails or gives no valid move
+    mode = session.ai_mode
     try:
-        response = client.messages.create(
-            model="claude-3-7-sonnet-20250219",
-            max_tokens=300,
-            temperature=0.2,
-            system=f"""You are playing Tic Tac Toe against a human player.
-
-IMPORTANT - YOU MUST REMEMBER WHICH MARKER IS YOURS:
-- If you're playing as X: All X marks on the board are YOUR marks, all O marks are the HUMAN's
-- If you're playing as O: All O marks on the board are YOUR marks, all X marks are the HUMAN's
-- You can only win by getting 3 of YOUR OWN markers in a row (regardless of board size)
-- You CANNOT win by getting 3 of the HUMAN's markers in a row
-- Always pay careful attention to which marker is yours in the current game
-
-The rules of Tic Tac Toe are:
-1. The board is a {size}x{size} grid numbered 0-{size*size-1}
-2. X always goes first, O always goes second
-3. Players take turns placing their marker on an empty space
-4. The first player to get 3 of their OWN markers in a row (horizontal, vertical, or diagonal) wins
-5. If all spaces are filled and no one has 3 in a row, the game is a tie
-
-CAREFUL ANALYSIS IS REQUIRED:
-- Take time to visualize the entire board layout
-- Check EVERY position on the board for both your markers and the human's markers
-- Scan ALL rows, columns, and both diagonals for potential winning lines or threats
-- Look for any sequences of 2 markers that can be extended to 3
-- Double-check your understanding before making your move
-- Check if the board size has changed since your last move
-- Being careful is more important than being quick
-
-Respond with a reasoning explanation followed by a single number 0-{size*size-1} representing your move position.""",
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        # Extract the full response
-        full_response = response.content[0].text.strip()
-        print(f"Full Claude response: {full_response}")
-        
-        # Store the AI's reasoning in session state
-        reasoning = ""
-        if "[reasoning]" in full_response and "[/reasoning]" in full_response:
-            reasoning = full_response.split("[reasoning]")[1].split("[/reasoning]")[0].strip()
-            st.session_state.ai_reasoning = reasoning
-            print(f"Extracted reasoning: {reasoning}")
-        else:
-            # Try a more flexible approach to extract reasoning
-            # Look for any text before a single number (the move)
-            import re
-            match = re.search(r"(.*?)(\d+)\s*$", full_response, re.DOTALL)
-            if match:
-                possible_reasoning = match.group(1).strip()
-                # Only use if it's a reasonable length
-                if len(possible_reasoning) > 5:
-                    reasoning = possible_reasoning
-                    st.session_state.ai_reasoning = reasoning
-                    print(f"Extracted reasoning (alternative method): {reasoning}")
-        
-        # Try to parse the response to get just a number
-        max_position = size*size - 1
-        
-        # First try to extract a possibly multi-digit number
-        import re
-        numbers = re.findall(r'\d+', full_response)
-        for num_str in numbers:
-            num = int(num_str)
-            if 0 <= num <= max_position and board[num] == " ":
-                return num
-        
-        # If that didn't work, try digit by digit
-        for char in full_response:
-            if char.isdigit() and 0 <= int(char) <= max_position:
-                move = int(char)
-                # Verify it's a valid move
-                if board[move] == " ":
-                    return move
-        
-        # If we couldn't parse a valid move, find the first empty space
-        for i in range(size*size):
-            if board[i] == " ":
-                return i
-                
+        move = ask()
+        if move is not None:
+            move_cache.put(board, ai_marker, move, session.ai_reasoning)
+    except CircuitOpenError:
+        metrics.count("claude_breaker_open")
+        # Claude keeps failing; play locally until the breaker lets a call through
+        if mode == AI_MODE_FALLBACK:
+            return get_local_move(board, ai_marker)
+        session.ai_reasoning = "Claude is unavailable right now, so this move was chosen locally."
+        return DEGRADED_STRATEGIES[DEGRADED_STRATEGY](board, ai_marker, session.local_time_budget)
     except Exception as e:
+        metrics.count("claude_errors")
+        if mode == AI_MODE_FALLBACK:
+            st.toast(f"Claude is unavailable ({e}), using the local engine")
+            return get_local_move(board, ai_marker)
         st.error(f"Error getting AI move: {e}")
+        move = None
+    
+    if move is None:
+        metrics.count("fallback_moves")
+        if mode == AI_MODE_FALLBACK:
+            return get_local_move(board, ai_marker)
         # Fallback: find first empty space
-        for i in range(size*size):
-            if board[i] == " ":
-                return i
+        empty_cells = board.empty_cells()
+        if empty_cells:
+            return empty_cells[0]
     
-    return None
+    return move
 
-def make_move(index):
-    # Make sure the game isn't over and the move is valid
-    if not st.session_state.game_over and st.session_state.board[index] == " ":
-        st.session_state.board[index] = st.session_state.current_player
-        
-        # Check for winner
-        winner = check_winner(st.session_state.board)
-        if winner:
-            st.session_state.game_over = True
-            st.session_state.winner = winner
-            if winner == "Tie":
-                st.session_state.ties += 1
-            elif winner == st.session_state.human_marker:
-                st.session_state.human_score += 1
-            else:
-                st.session_state.ai_score += 1
-        else:
-            # Switch players
-            st.session_state.current_player = 'O' if st.session_state.current_player == 'X' else 'X'
+def record_latency(streamed, reply):
+    # Keep the timings and token counts of the call for the latency panel
+    usage = reply.usage or {}
+    session.ai_latency.append(LatencySample(
+        session.move_protocol,
+        streamed,
+        reply.first_token,
+        reply.elapsed,
+        usage.get('output_tokens'),
+        usage.get('input_tokens'),
+        usage.get('cache_read_input_tokens'),
+        usage.get('cache_creation_input_tokens')
+    ))
+    
+    metrics.count("claude_calls")
+    for phase, seconds in (reply.timings or {}).items():
+        metrics.observe(f"claude_{phase}", seconds)
+    for name, key in (("input", 'input_tokens'), ("output", 'output_tokens'),
+                      ("cache_read", 'cache_read_input_tokens'), ("cache_write", 'cache_creation_input_tokens')):
+        if usage.get(key):
+            metrics.count(f"tokens_{name}", usage[key])
+
+def get_claude_move(board, ai_marker, human_marker, live_thought=None):
+    session.ai_reasoning = ""
+    provider = claude_provider()
+    
+    if session.stream_responses:
+        def show_reasoning(reasoning):
+            live_thought.markdown(
+                f'<div class="ai-message"><strong>Thinking...</strong> {reasoning}</div>',
+                unsafe_allow_html=True
+            )
+        reply = provider.stream_move(
+            board, ai_marker, human_marker,
+            show_reasoning if live_thought is not None else None,
+            session.move_protocol
+        )
+    else:
+        reply = provider.request_move(board, ai_marker, human_marker, session.move_protocol)
+    record_latency(session.stream_responses, reply)
+    
+    # Store the AI's reasoning in session state
+    session.ai_reasoning = reply.reasoning
+    return reply.move
+
+def finish_claude_job(job):
+    # The move from a finished background job, recorded like a direct call;
+    # raises the call's error
+    reply = job.result()
+    record_latency(job.streamed, reply)
+    session.ai_reasoning = reply.reasoning
+    return reply.move
+
+def cancel_background_work():
+    # Drop speculative replies and any Claude move in flight, which are for
+    # a position the board is about to leave
+    session.speculator.cancel()
+    if session.ai_job is not None:
+        session.ai_job.cancel()
+        session.ai_job = None
 
 def reset_game():
     # Reset the board with the current board size
-    size = st.session_state.board_size
-    st.session_state.board = [" " for _ in range(size*size)]
-    st.session_state.current_player = random.choice(['X', 'O'])
-    st.session_state.game_over = False
-    st.session_state.winner = None
-    st.session_state.game_count += 1
+    game.reset()
+    cancel_background_work()
     # Reset the AI reasoning for the new game
-    st.session_state.ai_reasoning = ""
+    session.ai_reasoning = ""
     # Note: ai_move_history is cleared in the Play Again button click handler
 
-# Process click from URL if needed    
-if st.session_state.clicked_cell is not None:
-    cell_index = st.session_state.clicked_cell
-    st.session_state.clicked_cell = None
-    # Make the move if valid
-    if (not st.session_state.game_over and 
-        0 <= cell_index < len(st.session_state.board) and 
-        st.session_state.board[cell_index] == " " and
-        st.session_state.current_player == st.session_state.human_marker):
-        make_move(cell_index)
-
 # UI elements
 # Adjust the column width based on board size to maintain square aspect ratio
-if 'board_size' in st.session_state:
-    if st.session_state.board_size >= 7:
-        col1, col2 = st.columns([5, 1])
-    elif st.session_state.board_size >= 5:
-        col1, col2 = st.columns([4, 1])
-    else:
-        col1, col2 = st.columns([3, 1])
+if game.size >= 7:
+    col1, col2 = st.columns([5, 1])
+elif game.size >= 5:
+    col1, col2 = st.columns([4, 1])
 else:
     col1, col2 = st.columns([3, 1])
 
-# Function to generate the game board HTML
 # Function to handle cell clicks
 def handle_cell_click(cell_index):
-    if (not st.session_state.game_over and 
-        0 <= cell_index < len(st.session_state.board) and 
-        st.session_state.board[cell_index] == " " and
-        st.session_state.current_player == st.session_state.human_marker):
-        make_move(cell_index)
+    if not game.is_human_turn:
+        return
+    with metrics.span("make_move"):
+        played = game.make_move(cell_index)
+    # A move that ends the game changes the scoreboard, so redraw the whole
+    # page; otherwise the board fragment carries on and draws the move
+    if played and game.game_over:
         st.rerun()
 
-with col1:
-    st.header(f"Game #{st.session_state.game_count}")
+def record_render_time(section, started):
+    # Milliseconds the last run of a part of the page took
+    seconds = time.perf_counter() - started
+    session.render_timings[section] = seconds * 1000
+    metrics.observe(f"render_{section}", seconds)
+
+def export_metrics():
+    # Write the process totals for dashboards, if files are configured
+    if not metrics.enabled or not (METRICS_PROM_PATH or METRICS_JSONL_PATH):
+        return
+    snapshot = get_process_metrics().snapshot()
+    if METRICS_PROM_PATH:
+        write_prometheus(snapshot, METRICS_PROM_PATH)
+    if METRICS_JSONL_PATH:
+        append_jsonl(snapshot, METRICS_JSONL_PATH, scope="process")
+
+def sync_game_url():
+    # Keep the game in the URL so any node can resume it
+    token = state_codec.encode(game, get_state_key())
+    if st.query_params.get(STATE_PARAM) != token:
+        st.query_params[STATE_PARAM] = token
+
+def play_ai_move(ai_move, turn_start):
+    # Add the move and reasoning to history and put the move on the board
+    reasoning = session.ai_reasoning if session.ai_reasoning else "No explanation provided"
+    session.ai_move_history.append(MoveNote(ai_move, reasoning))
+    
+    st.toast(f"Claude plays position {ai_move}")
+    with metrics.span("make_move"):
+        game.make_move(ai_move)
+    metrics.observe("ai_turn", time.perf_counter() - turn_start)
+    export_metrics()
+    # The thoughts panel (and the scoreboard if the game ended) changed too
+    st.rerun()
+
+# The board, the thoughts panel and the scoreboard/options column are
+# fragments: a widget inside one reruns only that function. Changes that
+# affect other parts of the page call st.rerun() to redraw all of it.
+@st.fragment
+def board_panel():
+    started = time.perf_counter()
+    # Play a new click before drawing, so the board shows it in this same run.
+    # The component keeps returning its last click, so only act on new ones
+    click = st.session_state.get("board_component")
+    if click is not None and click.get('id') != session.last_click_id:
+        session.last_click_id = click.get('id')
+        handle_cell_click(click['cell'])
+    
+    st.header(f"Game #{game.game_count}")
     
     # Who goes first info
-    if st.session_state.current_player == st.session_state.human_marker:
-        st.info(f"You go first! You are '{st.session_state.human_marker}'")
+    if game.current_player == game.human_marker:
+        st.info(f"You go first! You are '{game.human_marker}'")
     else:
-        st.info(f"Claude goes first! You are '{st.session_state.human_marker}'")
+        st.info(f"Claude goes first! You are '{game.human_marker}'")
     
     # Display the current board state
     st.subheader("Game Board")
     
-    # Add CSS for styling the buttons to match cells
-    st.markdown("""
-    <style>
-    .stButton>button {
-        background-color: #f5f5f5 !important;
-        border: 2px solid #cccccc !important;
-        border-radius: 4px !important;
-        width: 50px !important;
-        height: 50px !important;
-        display: flex !important;
-        justify-content: center !important;
-        align-items: center !important;
-        padding: 0 !important;
-        font-size: 24px !important;
-        font-weight: bold !important;
-        margin: 2px auto !important;
-        color: transparent !important;
-    }
-    
-    .stButton>button:hover {
-        background-color: #e5e5e5 !important;
-        border-color: #999999 !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-    
-    # Create a grid layout for the board
-    size = st.session_state.board_size
-    board = st.session_state.board
-    is_player_turn = st.session_state.current_player == st.session_state.human_marker and not st.session_state.game_over
-    
-    # Create a grid layout for direct button clicks
-    # Use Streamlit's built-in grid
-    size = st.session_state.board_size
-    
-    # Add CSS to make the buttons appear as cells
-    st.markdown("""
-    <style>
-    .stButton button {
-        width: 60px !important;
-        height: 60px !important;
-        padding: 0 !important;
-        display: flex !important;
-        justify-content: center !important;
-        align-items: center !important;
-        font-size: 24px !important;
-        font-weight: bold !important;
-        border-radius: 4px !important;
-    }
-    
-    .stButton button:focus {
-        box-shadow: none !important;
-    }
-    
-    /* Make containers more compact */
-    .element-container {
-        margin-bottom: 0 !important;
-        padding-bottom: 0 !important;
-    }
-    
-    div[data-testid="column"] > div {
-        padding: 0 2px !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-    
-    # Display the board as a grid of buttons
-    for row in range(size):
-        cols = st.columns(size)
-        for col in range(size):
-            index = row * size + col
-            with cols[col]:
-                marker = st.session_state.board[index]
-                
-                if marker == "X":
-                    # X cell
-                    st.markdown(
-                        f"""
-                        <div style="
-                            background-color: #e6f3ff;
-                            border: 2px solid #0066cc;
-                            color: blue;
-                            border-radius: 4px;
-                            width: 60px;
-                            height: 60px;
-                            display: flex;
-                            justify-content: center;
-                            align-items: center;
-                            font-size: 24px;
-                            font-weight: bold;
-                            margin: 0 auto;
-                        ">X</div>
-                        """, 
-                        unsafe_allow_html=True
-                    )
-                elif marker == "O":
-                    # O cell
-                    st.markdown(
-                        f"""
-                        <div style="
-                            background-color: #fff0f0;
-                            border: 2px solid #cc0000;
-                            color: red;
-                            border-radius: 4px;
-                            width: 60px;
-                            height: 60px;
-                            display: flex;
-                            justify-content: center;
-                            align-items: center;
-                            font-size: 24px;
-                            font-weight: bold;
-                            margin: 0 auto;
-                        ">O</div>
-                        """, 
-                        unsafe_allow_html=True
-                    )
-                elif st.session_state.current_player == st.session_state.human_marker and not st.session_state.game_over:
-                    # Empty cell that can be clicked
-                    if st.button("", key=f"cell_{index}"):
-                        # Handle the click directly
-                        make_move(index)
-                        st.rerun()
-                else:
-                    # Empty cell that can't be clicked
-                    st.markdown(
-                        f"""
-                        <div style="
-                            background-color: #f5f5f5;
-                            border: 2px solid #cccccc;
-                            border-radius: 4px;
-                            width: 60px;
-                            height: 60px;
-                            display: flex;
-                            justify-content: center;
-                            align-items: center;
-                            margin: 0 auto;
-                        "></div>
-                        """, 
-                        unsafe_allow_html=True
-                    )
-    
-    # Process clicks from URL parameters if any
-    if st.session_state.clicked_cell is not None:
-        cell_index = st.session_state.clicked_cell
-        st.session_state.clicked_cell = None
-        handle_cell_click(cell_index)
+    # Draw the whole board as one component; its clicks are handled above
+    board_component(
+        "".join(game.board),
+        game.size,
+        game.is_human_turn,
+        key="board_component"
+    )
     
     # Game status message and Play Again button
-    if st.session_state.game_over:
-        if st.session_state.winner == "Tie":
+    if game.game_over:
+        if game.winner == "Tie":
             st.success("Game ended in a tie!")
-        elif st.session_state.winner == st.session_state.human_marker:
+        elif game.winner == game.human_marker:
             st.success("🎉 You won! 🎉")
         else:
             st.warning("Claude won this round!")
@@ -501,84 +469,152 @@ with col1:
         if st.button("Play Again"):
             reset_game()
             # Clear Claude's thought history when starting a new game
-            st.session_state.ai_move_history = []
+            session.ai_move_history.clear()
             st.rerun()
     
-    # Handle AI's turn
-    if not st.session_state.game_over and st.session_state.current_player == st.session_state.ai_marker:
-        with st.spinner("Claude is thinking..."):
-            time.sleep(1)  # Add a small delay to make it feel more natural
-            ai_move = get_ai_move(st.session_state.board, st.session_state.ai_marker, st.session_state.human_marker)
-            if ai_move is not None:
-                # Add the move and reasoning to history
-                reasoning = st.session_state.ai_reasoning if st.session_state.ai_reasoning else "No explanation provided"
-                st.session_state.ai_move_history.append({
-                    'move': ai_move,
-                    'reasoning': reasoning
-                })
-                
-                st.toast(f"Claude plays position {ai_move}")
-                make_move(ai_move)
-                st.rerun()
-    
-    # Add a chat-like display for Claude's reasoning
-    ai_chat = st.container()
-    with ai_chat:
-        st.subheader("Claude's Thoughts")
+    record_render_time('board', started)
+    
+    # Handle AI's turn, unless Claude is already working it out in the background
+    if game.is_ai_turn:
+        if session.ai_job is None:
+            # Reasoning that is still streaming in shows here, above the thoughts panel
+            live_thought = st.empty()
+            with st.spinner("Claude is thinking..."):
+                turn_start = time.perf_counter()
+                with metrics.span("ai_move"):
+                    ai_move = get_ai_move(game.board, game.ai_marker, game.human_marker, live_thought)
+                if ai_move is PENDING:
+                    # Redraw the whole page, which starts ai_turn_poller
+                    st.rerun()
+                # Pad quick replies with a small delay to make it feel more natural
+                with metrics.span("ai_turn_padding"):
+                    time.sleep(max(0.0, MIN_AI_TURN_SECONDS - (time.perf_counter() - turn_start)))
+                if ai_move is not None:
+                    play_ai_move(ai_move, turn_start)
+    
+    # Start working out Claude's replies to the likely moves while the human decides
+    elif (not game.game_over and session.speculate and
+          api_key and session.ai_mode not in LOCAL_AI_MODES):
+        ai_marker = game.ai_marker
+        human_marker = game.human_marker
+        protocol = session.move_protocol
         
-        # Add CSS for the chat container
-        st.markdown("""
-        <style>
-        .ai-chat-container {
-            background-color: #f9f9f9;
-            border: 1px solid #ddd;
-            border-radius: 8px;
-            padding: 15px;
-            margin-top: 10px;
-            margin-bottom: 15px;
-            max-height: 150px;
-            overflow-y: auto;
-        }
-        .ai-message {
-            background-color: #e6f3ff;
-            border-radius: 8px;
-            padding: 10px;
-            margin-bottom: 8px;
-            border-left: 4px solid #0066cc;
-        }
-        </style>
-        """, unsafe_allow_html=True)
+        def speculate_reply(board_after):
+            return claude_provider().request_move(board_after, ai_marker, human_marker, protocol)
         
-        # Add container with the custom CSS class
-        st.markdown('<div class="ai-chat-container">', unsafe_allow_html=True)
-        
-        # Add reasoning history as separate markdown elements with newest first
-        if st.session_state.ai_move_history and len(st.session_state.ai_move_history) > 0:
-            # Reverse the order to show newest first
-            for move_info in reversed(st.session_state.ai_move_history):
-                move_num = move_info.get('move', '?')
-                reasoning_text = move_info.get('reasoning', 'No explanation provided')
-                st.markdown(
-                    f'<div class="ai-message"><strong>Move {move_num}</strong>: {reasoning_text}</div>',
-                    unsafe_allow_html=True
-                )
-        else:
-            st.markdown("<em>Claude will explain its moves here...</em>", unsafe_allow_html=True)
-                
-        st.markdown('</div>', unsafe_allow_html=True)
+        session.speculator.start(
+            game.board, ai_marker, human_marker, speculate_reply,
+            int(os.getenv("SPECULATION_TOP_N", 4))
+        )
+    
+    sync_game_url()
 
-with col2:
+# While Claude works out a move in the background only this fragment runs,
+# every AI_POLL_SECONDS: it shows the reasoning streamed so far, and plays
+# the move once it has arrived and the turn has lasted MIN_AI_TURN_SECONDS.
+# It is only drawn while a job is pending, so it stops polling after that.
+@st.fragment(run_every=AI_POLL_SECONDS)
+def ai_turn_poller():
+    job = session.ai_job
+    if job is None:
+        return
+    if not game.is_ai_turn or not job.is_for(game.board, game.ai_marker):
+        # The board changed under the job; the next turn asks again
+        cancel_background_work()
+        st.rerun()
+    if job.done() and time.perf_counter() - job.started >= MIN_AI_TURN_SECONDS:
+        session.ai_job = None
+        with metrics.span("ai_move"):
+            ai_move = play_claude_reply(game.board, game.ai_marker, lambda: finish_claude_job(job))
+        if ai_move is not None:
+            play_ai_move(ai_move, job.started)
+        st.rerun()
+    
+    if job.reasoning:
+        st.markdown(
+            f'<div class="ai-message"><strong>Thinking...</strong> {job.reasoning}</div>',
+            unsafe_allow_html=True
+        )
+    else:
+        st.info("Claude is thinking...")
+
+@st.fragment
+def thoughts_panel():
+    started = time.perf_counter()
+    # Add a chat-like display for Claude's reasoning
+    st.subheader("Claude's Thoughts")
+    
+    # Add CSS for the chat container
+    st.markdown("""
+    <style>
+    .ai-chat-container {
+        background-color: #f9f9f9;
+        border: 1px solid #ddd;
+        border-radius: 8px;
+        padding: 15px;
+        margin-top: 10px;
+        margin-bottom: 15px;
+        max-height: 150px;
+        overflow-y: auto;
+    }
+    .ai-message {
+        background-color: #e6f3ff;
+        border-radius: 8px;
+        padding: 10px;
+        margin-bottom: 8px;
+        border-left: 4px solid #0066cc;
+    }
+    </style>
+    """, unsafe_allow_html=True)
+    
+    # Add container with the custom CSS class
+    st.markdown('<div class="ai-chat-container">', unsafe_allow_html=True)
+    
+    # Add reasoning history as separate markdown elements with newest first
+    if session.ai_move_history:
+        # Reverse the order to show newest first
+        for move_info in reversed(session.ai_move_history):
+            st.markdown(
+                f'<div class="ai-message"><strong>Move {move_info.move}</strong>: {move_info.reasoning}</div>',
+                unsafe_allow_html=True
+            )
+    else:
+        st.markdown("<em>Claude will explain its moves here...</em>", unsafe_allow_html=True)
+            
+    st.markdown('</div>', unsafe_allow_html=True)
+    record_render_time('thoughts', started)
+
+def show_metrics(title, snapshot):
+    st.markdown(f"**{title}**")
+    if snapshot['spans']:
+        st.table([
+            {
+                'span': name,
+                'calls': stats['count'],
+                'avg ms': round(stats['total'] / stats['count'] * 1000, 2),
+                'max ms': round(stats['max'] * 1000, 2),
+            }
+            for name, stats in snapshot['spans'].items()
+        ])
+    if snapshot['counters']:
+        st.caption(", ".join(f"{name}: {value}" for name, value in snapshot['counters'].items()))
+    if not snapshot['spans'] and not snapshot['counters']:
+        st.caption("Nothing recorded yet")
+
+@st.fragment
+def options_panel():
+    started = time.perf_counter()
     st.header("Scoreboard")
     col_you, col_claude, col_ties = st.columns(3)
     
     with col_you:
-        st.metric("You", st.session_state.human_score)
+        st.metric("You", game.human_score)
     
     with col_claude:
-        st.metric("Claude", st.session_state.ai_score)
+        st.metric("Claude", game.ai_score)
     
     with col_ties:
-        st.metric("Ties", st.session_state.ties)
+        st.metric("Ties", game.ties)
     
     # Game options
     st.subheader("Options")
@@ -586,60 +622,220 @@ with col2:
     # Board size slider
     new_board_size = st.number_input(
         "Board Size:", 
-        min_value=3, 
-        max_value=8, 
-        value=int(st.session_state.board_size),
+        min_value=MIN_SIZE, 
+        max_value=MAX_SIZE, 
+        value=int(game.size),
         step=1,
         help="Choose the size of the board (e.g., 3 for a 3x3 board, 4 for a 4x4 board)"
     )
     
     # Check if board size has changed
-    if new_board_size != st.session_state.board_size:
-        # Update the board size
-        st.session_state.board_size = new_board_size
-        
+    if new_board_size != game.size:
         # Resize the board to match the new size while preserving existing moves
-        old_board = st.session_state.board.copy()
-        old_size = int(len(old_board) ** 0.5)  # Calculate old size from board length
-        new_board = [" " for _ in range(new_board_size * new_board_size)]
-        
-        # Copy values from old board to new board where possible
-        min_size = min(old_size, new_board_size)
-        for row in range(min_size):
-            for col in range(min_size):
-                old_index = row * old_size + col
-                new_index = row * new_board_size + col
-                if old_index < len(old_board) and new_index < len(new_board):
-                    new_board[new_index] = old_board[old_index]
-        
-        st.session_state.board = new_board
+        game.resize(new_board_size)
+        cancel_background_work()
+        st.rerun()
+    
+    # How many in a row win, up to the board size (5 on 15x15 plays like gomoku)
+    new_win_length = st.number_input(
+        "Marks in a row to win:",
+        min_value=MIN_WIN_LENGTH,
+        max_value=int(game.size),
+        value=int(game.win_length),
+        step=1,
+        help="3 is classic tic tac toe; 5 on a large board plays like gomoku"
+    )
+    if new_win_length != game.win_length:
+        game.set_win_length(new_win_length)
+        cancel_background_work()
         st.rerun()
     
     # Let user choose their marker for the next game
-    new_marker = st.radio("Choose your marker for next game:", options=["X", "O"], index=0 if st.session_state.human_marker == "X" else 1)
-    if new_marker != st.session_state.human_marker:
-        st.session_state.human_marker = new_marker
-        st.session_state.ai_marker = "O" if new_marker == "X" else "X"
+    new_marker = st.radio("Choose your marker for next game:", options=["X", "O"], index=0 if game.human_marker == "X" else 1)
+    if new_marker != game.human_marker:
+        game.set_human_marker(new_marker)
+        # Whose turn it is on the board depends on the markers
+        cancel_background_work()
+        st.rerun()
+    
+    # Choose who plays the AI's side
+    new_ai_mode = st.radio(
+        "AI opponent:",
+        options=AI_MODES,
+        index=AI_MODES.index(session.ai_mode),
+        help="Claude asks the API for every move; the local engine searches the board on this machine, "
+             "and the Monte Carlo engine plays random games from each move across all CPU cores (best on 6x6 and up)"
+    )
+    if new_ai_mode != session.ai_mode:
+        session.ai_mode = new_ai_mode
+        # A Claude move still in flight must not be played for the new opponent
+        cancel_background_work()
+        st.rerun()
+    
+    if session.ai_mode != AI_MODE_CLAUDE:
+        session.local_time_budget = st.slider(
+            "Local engine time per move (seconds):",
+            min_value=0.1,
+            max_value=5.0,
+            value=float(session.local_time_budget),
+            step=0.1
+        )
+    
+    session.use_opening_book = st.checkbox(
+        "Use opening book",
+        value=session.use_opening_book,
+        help="Play precomputed best replies on 3x3 and in the opening of 4x4 instead of asking the AI"
+    )
+    
+    protocol_labels = list(MOVE_PROTOCOLS)
+    protocol_label = st.radio(
+        "Claude's move format:",
+        options=protocol_labels,
+        index=list(MOVE_PROTOCOLS.values()).index(session.move_protocol),
+        help="A tool call returns the move as structured data; free text is parsed from Claude's prose"
+    )
+    session.move_protocol = MOVE_PROTOCOLS[protocol_label]
+    
+    session.stream_responses = st.checkbox(
+        "Stream Claude's responses",
+        value=session.stream_responses,
+        help="Show Claude's reasoning as it is written and play the move as soon as it arrives"
+    )
+    
+    session.background_turns = st.checkbox(
+        "Keep the page responsive while Claude thinks",
+        value=session.background_turns,
+        help="Asks Claude from a background worker and checks for the move every half second, "
+             "instead of holding the page until it arrives"
+    )
+    
+    session.speculate = st.checkbox(
+        "Precompute Claude's replies while you think",
+        value=session.speculate,
+        help="Asks Claude about your likely moves in the background (more API calls, faster replies)"
+    )
     
     # Reset scores button
     if st.button("Reset Scores"):
-        st.session_state.human_score = 0
-        st.session_state.ai_score = 0
-        st.session_state.ties = 0
-        st.session_state.game_count = 1
+        game.reset_scores()
         st.success("Scores reset!")
         time.sleep(1)
         st.rerun()
     
+    # Move cache statistics, for sizing MOVE_CACHE_SIZE
+    with st.expander("Move Cache"):
+        cache_stats = move_cache.stats()
+        st.metric("Hit rate", f"{cache_stats['hit_rate']:.0%}")
+        st.caption(
+            f"{cache_stats['hits']} hits ({cache_stats['disk_hits']} from disk), "
+            f"{cache_stats['misses']} misses, "
+            f"{cache_stats['entries']}/{cache_stats['max_entries']} entries"
+        )
+    
+    # Latency and output tokens of Claude's replies, by move format and streaming
+    with st.expander("AI Latency"):
+        for protocol_label, protocol in MOVE_PROTOCOLS.items():
+            for streamed, label in ((True, "streamed"), (False, "complete reply")):
+                samples = [
+                    entry for entry in session.ai_latency
+                    if entry.protocol == protocol and entry.streamed == streamed
+                ]
+                if samples:
+                    move_avg = sum(entry.move for entry in samples) / len(samples)
+                    first_avg = sum(entry.first_token or entry.move for entry in samples) / len(samples)
+                    tokens = [entry.output_tokens for entry in samples if entry.output_tokens is not None]
+                    tokens_text = f", {sum(tokens) / len(tokens):.0f} output tokens" if tokens else ""
+                    st.caption(
+                        f"{protocol_label}, {label}: {move_avg:.2f}s to move, "
+                        f"{first_avg:.2f}s to first output{tokens_text} ({len(samples)} calls)"
+                    )
+        if not session.ai_latency:
+            st.caption("No Claude calls yet")
+        else:
+            latest = session.ai_latency[-1]
+            total_cached = sum(entry.cache_read_tokens or 0 for entry in session.ai_latency)
+            total_written = sum(entry.cache_write_tokens or 0 for entry in session.ai_latency)
+            total_uncached = sum(entry.input_tokens or 0 for entry in session.ai_latency)
+            st.caption(
+                f"Input tokens: {total_cached} read from prompt cache, {total_written} written to it, "
+                f"{total_uncached} uncached (last call: {latest.cache_read_tokens or 0} cached)"
+            )
+        provider = peek_provider(api_key)
+        if provider is not None:
+            st.caption(f"API circuit breaker: {provider.breaker.state}")
+        st.caption(f"API calls saved by forced moves: {session.api_calls_saved}")
+        st.caption(f"Claude moves in flight on the background worker: {get_ai_worker().pending()}")
+    
+    # How long the last run of each part of the page took; a click on the
+    # board reruns only the board, where it used to rerun the whole page
+    with st.expander("Render Timings"):
+        timings = session.render_timings
+        for section, label in RENDER_SECTIONS.items():
+            if section in timings:
+                st.caption(f"{label}: {timings[section]:.1f} ms")
+        if not timings:
+            st.caption("Nothing rendered yet")
+    
+    # Bytes this session holds, for working out memory per concurrent player
+    with st.expander("Session Memory"):
+        report = session.memory_report()
+        total = report.pop('total')
+        st.metric("This session", f"{total / 1024:.1f} KiB")
+        st.caption(", ".join(
+            f"{name}: {size:,} B" for name, size in sorted(report.items(), key=lambda item: -item[1]) if size
+        ))
+    
+    # Where the time goes, per session and for the whole process
+    metrics.enabled = st.checkbox(
+        "Collect timing metrics",
+        value=metrics.enabled,
+        help="Time each phase of a move and count tokens and cache hits, shown under Debug Metrics"
+    )
+    if metrics.enabled:
+        with st.expander("Debug Metrics"):
+            show_metrics("This session", metrics.snapshot())
+            process_snapshot = get_process_metrics().snapshot()
+            show_metrics("All sessions", process_snapshot)
+            st.download_button(
+                "Prometheus text", to_prometheus(process_snapshot),
+                file_name="tictactoe_metrics.prom", mime="text/plain"
+            )
+            st.download_button(
+                "JSONL", to_jsonl(metrics.snapshot(), scope="session") + to_jsonl(process_snapshot, scope="process"),
+                file_name="tictactoe_metrics.jsonl", mime="application/x-ndjson"
+            )
+    
     # Game instructions
     with st.expander("How to Play"):
         st.markdown(f"""
         1. You are playing against Claude, an AI.
         2. X always goes first, O always goes second.
         3. Click on an empty space to place your marker.
-        4. The first player to get 3 in a row (horizontally, vertically, or diagonally) wins.
-        5. If all spaces are filled and no one has 3 in a row, the game is a tie.
-        6. You can change the board size using the input above - from 3x3 up to 8x8!
+        4. The first player to get {game.win_length} in a row (horizontally, vertically, or diagonally) wins.
+        5. If all spaces are filled and no one has {game.win_length} in a row, the game is a tie.
+        6. You can change the board size using the input above - from {MIN_SIZE}x{MIN_SIZE} up to {MAX_SIZE}x{MAX_SIZE} - and how many in a row win!
         
         Claude has been programmed to play an optimal strategy, so it will be challenging to win!
-        """)
\ No newline at end of file
+        """)    
+    record_render_time('options', started)
+
+# Each part keeps its place in the layout, but the board is drawn last so
+# the rest of the page is already up to date while the AI takes its turn
+with col1:
+    board_area = st.container()
+    thoughts_area = st.container()
+
+with col2:
+    options_panel()
+
+with thoughts_area:
+    thoughts_panel()
+
+with board_area:
+    board_panel()
+    if session.ai_job is not None:
+        ai_turn_poller()
+
+sync_game_url()
+
+record_render_time('app', script_start)
@@ -0,0 +1,24 @@
+# Game logic shared by the Streamlit app, kept free of Streamlit imports.
+#
+# Names are imported from their modules on first access, so importing the
+# package loads nothing until something is used.
+
+import importlib
+
+_EXPORTS = {
+    "BitBoard": "bitboard",
+    "WIN_MASKS": "bitboard",
+    "CELL_MASKS": "bitboard",
+    "Game": "game",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
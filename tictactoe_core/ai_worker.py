@@ -0,0 +1,85 @@
+# Claude moves worked out in the background, on one event loop per process.
+#
+# A Claude turn used to run inside the script run, holding a script thread
+# and freezing the page until the reply came back. AIWorker runs an asyncio
+# event loop on a daemon thread instead: the app submits the move request,
+# gets a MoveJob back at once and finishes its run, and a later run picks up
+# the reply. A request that is waiting on the API is only a coroutine, so
+# one worker keeps the calls of many sessions in flight at once.
+
+import asyncio
+import threading
+import time
+
+from .claude_player import PROTOCOL_TOOL
+from .speculation import _position_key
+
+
+class MoveJob:
+    # One Claude move in flight. reasoning holds the reasoning streamed so
+    # far; result() returns the MoveReply or raises the call's error.
+    __slots__ = ("key", "streamed", "started", "reasoning", "future")
+
+    def __init__(self, board, ai_marker, streamed):
+        self.key = _position_key(board, ai_marker)
+        self.streamed = streamed
+        self.started = time.perf_counter()
+        self.reasoning = ""
+        self.future = None
+
+    def set_reasoning(self, reasoning):
+        self.reasoning = reasoning
+
+    def is_for(self, board, ai_marker):
+        # Whether the job was asked for this position
+        return self.key == _position_key(board, ai_marker)
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        return self.future.result()
+
+    def cancel(self):
+        self.future.cancel()
+
+
+class AIWorker:
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="ai-worker", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def request_move(self, provider, board, ai_marker, human_marker, protocol=PROTOCOL_TOOL, stream=True):
+        # Start asking Claude (through a MoveProvider) for a move and return
+        # its MoveJob. The board is copied, so the caller may go on changing it.
+        board = board.copy()
+        job = MoveJob(board, ai_marker, stream)
+        if stream:
+            call = provider.stream_move_async(board, ai_marker, human_marker, job.set_reasoning, protocol)
+        else:
+            call = provider.request_move_async(board, ai_marker, human_marker, protocol)
+        with self._lock:
+            self._in_flight += 1
+        job.future = asyncio.run_coroutine_threadsafe(call, self.loop)
+        job.future.add_done_callback(self._finished)
+        return job
+
+    def _finished(self, future):
+        with self._lock:
+            self._in_flight -= 1
+
+    def pending(self):
+        # Moves submitted and not finished yet
+        with self._lock:
+            return self._in_flight
+
+    def shutdown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
@@ -0,0 +1,130 @@
+# Classify many boards at once with NumPy.
+#
+# Boards are rows of an (N, size*size) int8 array with 1 for X, -1 for O and
+# 0 for an empty cell. The boards are turned into a (size, size, N) stack, so
+# every run of WIN_LENGTH cells along rows, columns and both diagonals is
+# summed for all boards at once by adding shifted slices, each operation
+# running over N contiguous values. A window summing to WIN_LENGTH (or the
+# win length given) is an X line and its negative an O line. The result for each board is the same as
+# BitBoard.winner() (and so check_winner), including which player is
+# reported when a board that could not occur in play has lines for both.
+
+import numpy as np
+
+from .bitboard import SizeTable, WIN_LENGTH, WIN_MASKS
+
+X_CELL = 1
+O_CELL = -1
+EMPTY_CELL = 0
+
+# Result codes, and the matching check_winner value for each
+ONGOING, X_WINS, O_WINS, TIE = 0, 1, 2, 3
+RESULT_NAMES = (None, "X", "O", "Tie")
+
+
+def _window_masks(size, win_length=WIN_LENGTH):
+    # Bitmask of every window in the order _window_sums lays them out:
+    # rows, columns, diagonals, anti-diagonals, each by start row then column
+    n = size - win_length + 1
+
+    def line(row, col, d_row, d_col):
+        mask = 0
+        for i in range(win_length):
+            mask |= 1 << ((row + d_row * i) * size + col + d_col * i)
+        return mask
+
+    masks = [line(r, c, 0, 1) for r in range(size) for c in range(n)]
+    masks += [line(r, c, 1, 0) for r in range(n) for c in range(size)]
+    masks += [line(r, c, 1, 1) for r in range(n) for c in range(n)]
+    masks += [line(r, c + win_length - 1, 1, -1) for r in range(n) for c in range(n)]
+    return masks
+
+
+def _line_ranks(size, win_length=WIN_LENGTH):
+    # Position in WIN_MASKS[size, win_length] of every window, shaped like the
+    # sums from _direction_sums, so the first completed line can be found the
+    # way winner() finds it
+    position = {mask: index for index, mask in enumerate(WIN_MASKS[size, win_length])}
+    ranks = np.array([position[mask] for mask in _window_masks(size, win_length)], dtype=np.int16)
+    n = size - win_length + 1
+    shapes = ((size, n), (n, size), (n, n), (n, n))
+    splits = np.cumsum([rows * cols for rows, cols in shapes])[:-1]
+    # Trailing axis to broadcast against the board axis of the sums
+    return tuple(part.reshape(shape + (1,)) for part, shape in zip(np.split(ranks, splits), shapes))
+
+
+LINE_RANKS = SizeTable(_line_ranks)
+
+# Rank for "no completed line", after every real one
+NO_LINE = np.int16(np.iinfo(np.int16).max)
+
+
+def _direction_sums(cells, size, win_length=WIN_LENGTH):
+    # Sum of every window for rows, columns, diagonals and anti-diagonals,
+    # each a (start rows, start columns, N) array built from shifted views
+    boards = np.ascontiguousarray(cells.T).reshape(size, size, -1)
+    n = size - win_length + 1
+    k = win_length - 1
+    return (
+        sum(boards[:, i:i + n] for i in range(win_length)),
+        sum(boards[i:i + n, :] for i in range(win_length)),
+        sum(boards[i:i + n, i:i + n] for i in range(win_length)),
+        sum(boards[i:i + n, k - i:k - i + n] for i in range(win_length)),
+    )
+
+
+def classify(cells, win_length=WIN_LENGTH):
+    # Result code (ONGOING, X_WINS, O_WINS or TIE) for each row of `cells`
+    cells = np.asarray(cells, dtype=np.int8)
+    if cells.ndim != 2:
+        raise ValueError(f"expected an (N, size*size) array, got shape {cells.shape}")
+    size = int(round(cells.shape[1] ** 0.5))
+    if size * size != cells.shape[1] or size < win_length:
+        raise ValueError(f"{cells.shape[1]} cells is not a square board of size {win_length} or more")
+
+    # Rank of the first completed line for each player; the lower one won,
+    # and X wins a tie because winner() checks X first on each line
+    first_x = np.full(len(cells), NO_LINE, dtype=np.int16)
+    first_o = np.full(len(cells), NO_LINE, dtype=np.int16)
+    for sums, ranks in zip(_direction_sums(cells, size, win_length), LINE_RANKS[size, win_length]):
+        np.minimum(first_x, np.where(sums == win_length, ranks, NO_LINE).min(axis=(0, 1)), out=first_x)
+        np.minimum(first_o, np.where(sums == -win_length, ranks, NO_LINE).min(axis=(0, 1)), out=first_o)
+
+    results = np.full(len(cells), ONGOING, dtype=np.int8)
+    results[~(cells == EMPTY_CELL).any(axis=1)] = TIE
+    results[first_o < first_x] = O_WINS
+    results[(first_x < NO_LINE) & (first_x <= first_o)] = X_WINS
+    return results
+
+
+def encode(boards):
+    # (N, size*size) int8 array for a sequence of same-size BitBoards
+    size = boards[0].size
+    if size * size <= 64:
+        shifts = np.arange(size * size, dtype=np.uint64)
+        x = np.array([board.x for board in boards], dtype=np.uint64)
+        o = np.array([board.o for board in boards], dtype=np.uint64)
+        x_cells = (x[:, None] >> shifts) & np.uint64(1)
+        o_cells = (o[:, None] >> shifts) & np.uint64(1)
+        return x_cells.astype(np.int8) - o_cells.astype(np.int8)
+    # Masks of larger boards do not fit a uint64; unpack them from bytes
+    length = (size * size + 7) // 8
+
+    def unpack(masks):
+        data = np.frombuffer(b"".join(mask.to_bytes(length, "little") for mask in masks), dtype=np.uint8)
+        bits = np.unpackbits(data.reshape(len(boards), length), axis=1, bitorder="little")
+        return bits[:, :size * size].astype(np.int8)
+    return unpack([board.x for board in boards]) - unpack([board.o for board in boards])
+
+
+def random_positions(count, size, rng=None):
+    # `count` positions from random games cut off after a random number of
+    # moves (X moves first), for testing and benchmarks
+    rng = np.random.default_rng(rng)
+    cells = size * size
+    # Rank of each cell in a random move order, and how many moves were played
+    ranks = rng.random((count, cells)).argsort(axis=1).argsort(axis=1)
+    plies = rng.integers(0, cells + 1, size=(count, 1))
+    played = ranks < plies
+    markers = np.where(ranks % 2 == 0, X_CELL, O_CELL).astype(np.int8)
+    return np.where(played, markers, EMPTY_CELL).astype(np.int8)
@@ -0,0 +1,353 @@
+# Bitboard representation of the game board.
+#
+# Each player's marks are kept in one integer with bit i set when cell i
+# (row * size + col) holds that player's marker. Win checks, listing empty
+# cells and applying moves then come down to a few bitwise operations on
+# masks that are built once per board size and line length, the first time
+# they are used. A move only needs the lines through its cell, at most four
+# per cell of the line length, so checking it costs the same on any size.
+# Each board also carries Zobrist hashes, kept up to date by play() and
+# undo(), so positions can be used as keys without hashing every cell.
+
+import random
+from operator import xor
+
+# Marks in a row needed to win, unless a game chooses another length
+WIN_LENGTH = 3
+MIN_WIN_LENGTH = 3
+MIN_SIZE = 3
+MAX_SIZE = 19
+
+EMPTY = " "
+MARKERS = ("X", "O")
+
+
+class SizeTable(dict):
+    # Table keyed by board size, or by (size, win_length) for tables that
+    # depend on the line length, that builds each entry on first lookup, so
+    # importing the package costs nothing for sizes that are never played
+
+    __slots__ = ("_build",)
+
+    def __init__(self, build):
+        super().__init__()
+        self._build = build
+
+    def __missing__(self, key):
+        value = self[key] = self._build(*key) if isinstance(key, tuple) else self._build(key)
+        return value
+
+
+def build_win_masks(size, win_length=WIN_LENGTH):
+    # Every run of win_length cells in a row, column or diagonal, as a bitmask
+    masks = []
+    for row in range(size):
+        for col in range(size):
+            for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_row = row + d_row * (win_length - 1)
+                end_col = col + d_col * (win_length - 1)
+                if not (0 <= end_row < size and 0 <= end_col < size):
+                    continue
+                mask = 0
+                for i in range(win_length):
+                    mask |= 1 << ((row + d_row * i) * size + col + d_col * i)
+                masks.append(mask)
+    return tuple(masks)
+
+
+def masks_by_cell(masks, size):
+    # For each cell, the masks in `masks` that include it, in the same order
+    by_cell = [[] for _ in range(size * size)]
+    for mask in masks:
+        for index in iter_bits(mask):
+            by_cell[index].append(mask)
+    return tuple(tuple(cell_masks) for cell_masks in by_cell)
+
+
+def build_cell_masks(size, win_length=WIN_LENGTH):
+    # The winning lines through each cell, so a move only tests what it can complete
+    return masks_by_cell(WIN_MASKS[size, win_length], size)
+
+
+# All winning lines, by (size, win_length)
+WIN_MASKS = SizeTable(build_win_masks)
+
+# The winning lines through each cell, by (size, win_length)
+CELL_MASKS = SizeTable(build_cell_masks)
+
+# Every cell of the board set
+FULL_MASKS = SizeTable(lambda size: (1 << size * size) - 1)
+
+
+def build_symmetries(size):
+    # The 8 rotations and reflections of the board, each as a permutation
+    # mapping a cell index to where that cell ends up
+    perms = []
+    for flip in (False, True):
+        for turns in range(4):
+            perm = []
+            for index in range(size * size):
+                row, col = divmod(index, size)
+                if flip:
+                    col = size - 1 - col
+                for _ in range(turns):
+                    row, col = col, size - 1 - row
+                perm.append(row * size + col)
+            perms.append(tuple(perm))
+    return tuple(perms)
+
+
+def build_inverse_symmetries(size):
+    return tuple(tuple(perm.index(index) for index in range(size * size)) for perm in SYMMETRIES[size])
+
+
+SYMMETRIES = SizeTable(build_symmetries)
+
+# Inverse permutations, to map a cell of a transformed board back
+INVERSE_SYMMETRIES = SizeTable(build_inverse_symmetries)
+
+
+def build_zobrist_keys(size):
+    # A random 64-bit key per marker and cell. Seeded by size, so every
+    # process hashes a position the same way and hashes can be stored.
+    rng = random.Random(f"zobrist:{size}")
+    return {marker: tuple(rng.getrandbits(64) for _ in range(size * size)) for marker in MARKERS}
+
+
+def build_symmetric_keys(size):
+    # For each marker and cell, the key of the cell it maps to under each of
+    # the 8 symmetries, so all 8 hashes of a board move with one XOR each
+    keys = ZOBRIST_KEYS[size]
+    return {
+        marker: tuple(tuple(keys[marker][perm[index]] for perm in SYMMETRIES[size]) for index in range(size * size))
+        for marker in MARKERS
+    }
+
+
+ZOBRIST_KEYS = SizeTable(build_zobrist_keys)
+SYMMETRIC_KEYS = SizeTable(build_symmetric_keys)
+
+# Hashes of an empty board under every symmetry
+EMPTY_HASHES = (0,) * 8
+
+
+def zobrist_hashes(size, x, o):
+    # Hash of the position under each symmetry, computed from scratch
+    hashes = EMPTY_HASHES
+    for marker, bits in (("X", x), ("O", o)):
+        if bits:
+            keys = SYMMETRIC_KEYS[size][marker]
+            for index in iter_bits(bits):
+                hashes = tuple(map(xor, hashes, keys[index]))
+    return hashes
+
+
+def popcount(bits):
+    return bin(bits).count("1")
+
+
+def iter_bits(bits):
+    # Yield the index of every set bit, lowest first
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def transform_bits(bits, perm):
+    out = 0
+    for index in iter_bits(bits):
+        out |= 1 << perm[index]
+    return out
+
+
+def canonical(me, opp, size):
+    # Smallest (me, opp) pair over all symmetries of the position, plus the
+    # index of the symmetry that produces it
+    best = None
+    for symmetry, perm in enumerate(SYMMETRIES[size]):
+        key = (transform_bits(me, perm), transform_bits(opp, perm))
+        if best is None or key < best[:2]:
+            best = key + (symmetry,)
+    return best
+
+
+class BitBoard:
+    # Game board stored as one bitmask per player.
+    #
+    # Indexing, slicing, iteration and len() behave like the old list of
+    # one-character strings, so rendering and prompt code can keep treating
+    # it as a list of cells.
+
+    __slots__ = ("size", "x", "o", "empty", "win_length", "_hashes", "_win_masks", "_cell_masks")
+
+    def __init__(self, size=3, x=0, o=0, win_length=WIN_LENGTH):
+        self.size = int(size)
+        self.x = x
+        self.o = o
+        self.win_length = int(win_length)
+        # Running count of empty cells, kept up to date by play() and undo()
+        self.empty = self.size * self.size - popcount(x | o)
+        # Zobrist hash under each symmetry (the first is the board as it is),
+        # worked out on first use for a board built from masks and then kept
+        # up to date by play() and undo()
+        self._hashes = None if x | o else EMPTY_HASHES
+        # WIN_MASKS and CELL_MASKS entries for the board's size and win
+        # length, looked up by the first win check that needs them
+        self._win_masks = self._cell_masks = None
+
+    @classmethod
+    def from_list(cls, cells, win_length=WIN_LENGTH):
+        size = int(len(cells) ** 0.5)
+        x = o = 0
+        for index, marker in enumerate(cells):
+            if marker == "X":
+                x |= 1 << index
+            elif marker == "O":
+                o |= 1 << index
+        return cls(size, x, o, win_length)
+
+    def to_list(self):
+        return [self._cell(index) for index in range(self.size * self.size)]
+
+    def copy(self):
+        board = BitBoard.__new__(BitBoard)
+        board.size, board.x, board.o, board.empty = self.size, self.x, self.o, self.empty
+        board.win_length, board._hashes = self.win_length, self._hashes
+        board._win_masks, board._cell_masks = self._win_masks, self._cell_masks
+        return board
+
+    def _cell(self, index):
+        if self.x >> index & 1:
+            return "X"
+        if self.o >> index & 1:
+            return "O"
+        return EMPTY
+
+    def __len__(self):
+        return self.size * self.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._cell(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("board index out of range")
+        return self._cell(index)
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __contains__(self, marker):
+        if marker == EMPTY:
+            return self.empty > 0
+        return bool(self.bits(marker))
+
+    def __eq__(self, other):
+        if isinstance(other, BitBoard):
+            return ((self.size, self.x, self.o, self.win_length) ==
+                    (other.size, other.x, other.o, other.win_length))
+        return NotImplemented
+
+    def __hash__(self):
+        return self.hashes[0]
+
+    def __repr__(self):
+        return f"BitBoard(size={self.size}, x={self.x:#x}, o={self.o:#x}, win_length={self.win_length})"
+
+    @property
+    def hashes(self):
+        if self._hashes is None:
+            self._hashes = zobrist_hashes(self.size, self.x, self.o)
+        return self._hashes
+
+    @property
+    def zobrist(self):
+        return self.hashes[0]
+
+    def canonical_hash(self):
+        # Smallest hash over all symmetries of the position, plus the index
+        # of the symmetry that produces it (see SYMMETRIES)
+        best = min(self.hashes)
+        return best, self.hashes.index(best)
+
+    def bits(self, marker):
+        return self.x if marker == "X" else self.o
+
+    def occupied_mask(self):
+        return self.x | self.o
+
+    def empty_mask(self):
+        return FULL_MASKS[self.size] & ~(self.x | self.o)
+
+    def empty_cells(self):
+        return list(iter_bits(self.empty_mask()))
+
+    def is_empty(self, index):
+        return not (self.x | self.o) >> index & 1
+
+    def play(self, index, marker):
+        if marker == "X":
+            self.x |= 1 << index
+        else:
+            self.o |= 1 << index
+        self.empty -= 1
+        if self._hashes is not None:
+            self._hashes = tuple(map(xor, self._hashes, SYMMETRIC_KEYS[self.size][marker][index]))
+
+    def undo(self, index):
+        marker = self._cell(index)
+        if marker == EMPTY:
+            return
+        bit = 1 << index
+        self.x &= ~bit
+        self.o &= ~bit
+        self.empty += 1
+        if self._hashes is not None:
+            self._hashes = tuple(map(xor, self._hashes, SYMMETRIC_KEYS[self.size][marker][index]))
+
+    def winner(self):
+        # Full check of every line, same result as scanning the board
+        win_masks = self._win_masks
+        if win_masks is None:
+            win_masks = self._win_masks = WIN_MASKS[self.size, self.win_length]
+        for mask in win_masks:
+            if self.x & mask == mask:
+                return "X"
+            if self.o & mask == mask:
+                return "O"
+        if self.empty == 0:
+            return "Tie"
+        return None
+
+    def winner_at(self, index):
+        # Only the lines through the last move can have been completed by it
+        marker = self._cell(index)
+        bits = self.bits(marker)
+        cell_masks = self._cell_masks
+        if cell_masks is None:
+            cell_masks = self._cell_masks = CELL_MASKS[self.size, self.win_length]
+        for mask in cell_masks[index]:
+            if bits & mask == mask:
+                return marker
+        if self.empty == 0:
+            return "Tie"
+        return None
+
+    def resized(self, new_size, win_length=None):
+        # Copy marks into a board of a different size, keeping their row and
+        # column where both boards have them. The line length stays the same
+        # unless another is given.
+        new_size = int(new_size)
+        min_size = min(self.size, new_size)
+        x = o = 0
+        for row in range(min_size):
+            for col in range(min_size):
+                bit = 1 << (row * self.size + col)
+                new_bit = 1 << (row * new_size + col)
+                if self.x & bit:
+                    x |= new_bit
+                elif self.o & bit:
+                    o |= new_bit
+        return BitBoard(new_size, x, o, self.win_length if win_length is None else win_length)
@@ -0,0 +1,101 @@
+# Build the opening book read by tictactoe_core.opening_book.
+#
+# Enumerates every position reachable within the given number of plies
+# (either player may move first), keeps one representative per symmetry
+# class, solves it exactly with the alpha-beta engine and writes the
+# fixed-size records sorted by key.
+#
+#     python -m tictactoe_core.build_book
+#     python -m tictactoe_core.build_book --plies 3:9 --plies 4:4
+
+import argparse
+import sys
+import time
+
+from .bitboard import BitBoard, CELL_MASKS, FULL_MASKS, WIN_LENGTH, canonical, iter_bits
+from .opening_book import BOOK_PATH, HEADER, MAGIC, RECORD, SECTION, VERSION, WIN, DRAW, LOSS
+from .search import find_best_move, WIN_SCORE
+
+# Plies covered per board size: every position for 3x3, the opening of 4x4
+DEFAULT_PLIES = {3: 9, 4: 4}
+
+# Upper bound on the time the engine may take to solve one position
+SOLVE_TIME_LIMIT = 600.0
+
+
+def _wins(bits, index, size):
+    return any(bits & mask == mask for mask in CELL_MASKS[size, WIN_LENGTH][index])
+
+
+def enumerate_positions(size, plies):
+    # Canonical (side to move, opponent) pairs of every unfinished position
+    # with at most `plies` marks on the board
+    positions = set()
+    frontier = {(0, 0)}
+    for ply in range(plies + 1):
+        positions |= frontier
+        if ply == plies:
+            break
+        next_frontier = set()
+        for me, opp in frontier:
+            empty = FULL_MASKS[size] & ~(me | opp)
+            for index in iter_bits(empty):
+                new_me = me | (1 << index)
+                if _wins(new_me, index, size) or new_me | opp == FULL_MASKS[size]:
+                    continue
+                next_frontier.add(canonical(opp, new_me, size)[:2])
+        frontier = next_frontier
+    return sorted(positions)
+
+
+def solve(size, me, opp):
+    board = BitBoard(size, x=me, o=opp)
+    result = find_best_move(board, "X", time_budget=SOLVE_TIME_LIMIT)
+    if not result.complete:
+        raise RuntimeError(f"could not solve {size}x{size} position {me:#x}/{opp:#x}")
+    if result.score >= WIN_SCORE:
+        value = WIN
+    elif result.score <= -WIN_SCORE:
+        value = LOSS
+    else:
+        value = DRAW
+    return result.move, value
+
+
+def build(path, plies_by_size):
+    sections = []
+    for size, plies in sorted(plies_by_size.items()):
+        start = time.perf_counter()
+        records = [(me, opp) + solve(size, me, opp) for me, opp in enumerate_positions(size, plies)]
+        sections.append((size, records))
+        print(f"{size}x{size}: {len(records)} positions up to ply {plies} "
+              f"in {time.perf_counter() - start:.1f}s")
+
+    offset = HEADER.size + SECTION.size * len(sections)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(sections)))
+        for size, records in sections:
+            f.write(SECTION.pack(size, len(records), offset))
+            offset += RECORD.size * len(records)
+        for size, records in sections:
+            for record in records:
+                f.write(RECORD.pack(*record))
+    print(f"Wrote {path}")
+
+
+def parse_plies(value):
+    size, plies = value.split(":")
+    return int(size), int(plies)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the opening book for small boards")
+    parser.add_argument("--output", default=BOOK_PATH, help="where to write the book")
+    parser.add_argument("--plies", type=parse_plies, action="append",
+                        help="SIZE:PLIES to cover, may be repeated (default: 3:9 and 4:4)")
+    args = parser.parse_args(argv)
+    build(args.output, dict(args.plies) if args.plies else DEFAULT_PLIES)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
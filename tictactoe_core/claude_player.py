@@ -0,0 +1,424 @@
+# Claude as a player: builds the move request and reads back the reply.
+#
+# Everything here takes the client and board explicitly and never touches
+# Streamlit, so requests can also be made from worker threads and tools.
+
+import functools
+import inspect
+import logging
+import time
+from collections import namedtuple
+
+from .bitboard import WIN_LENGTH
+from .response_parser import parse_response, StreamingMoveParser
+
+logger = logging.getLogger(__name__)
+
+MODEL = "claude-3-7-sonnet-20250219"
+
+# How the move comes back: a place_mark tool call, or free text parsed by regex
+PROTOCOL_TOOL = "tool"
+PROTOCOL_TEXT = "text"
+
+# Output token ceilings per protocol
+MAX_TOKENS = {PROTOCOL_TOOL: 150, PROTOCOL_TEXT: 300}
+
+# Sampling temperature, sent only to SDKs whose messages.create still takes it
+TEMPERATURE = 0.2
+
+PLACE_MARK_TOOL = {
+    "name": "place_mark",
+    "description": "Place your marker on an empty position of the board.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "reasoning": {
+                "type": "string",
+                "description": "Why you chose this position, in 1-2 short sentences."
+            },
+            "position": {
+                "type": "integer",
+                "description": "Index of the empty position to play."
+            }
+        },
+        "required": ["reasoning", "position"]
+    }
+}
+
+# move is None when the reply held no valid move. first_token is the time to
+# the first streamed output (the full time when not streaming), usage the
+# API's token usage for the call (summed over a re-ask), and timings the
+# seconds spent building the prompt, waiting on the API and parsing (plus
+# "reask", the part of "api" spent asking again after an invalid tool call).
+MoveReply = namedtuple("MoveReply", ["move", "reasoning", "first_token", "elapsed", "usage", "timings"],
+                       defaults=(None,))
+
+
+# Marks the end of the static part of the request for provider-side caching
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+@functools.lru_cache(maxsize=None)
+def _system_blocks(size, protocol, win_length=WIN_LENGTH):
+    # The system prompt and position legend depend only on the board size, win
+    # length and protocol. Together with the tool definition they form the
+    # cached prefix.
+    if protocol == PROTOCOL_TOOL:
+        reply_instructions = "Reply by calling the place_mark tool with your move position and a short reason."
+    else:
+        reply_instructions = f"Respond with a reasoning explanation followed by a single number 0-{size*size-1} representing your move position."
+    
+    system = f"""You are playing Tic Tac Toe against a human player.
+
+IMPORTANT - YOU MUST REMEMBER WHICH MARKER IS YOURS:
+- If you're playing as X: All X marks on the board are YOUR marks, all O marks are the HUMAN's
+- If you're playing as O: All O marks on the board are YOUR marks, all X marks are the HUMAN's
+- You can only win by getting {win_length} of YOUR OWN markers in a row (regardless of board size)
+- You CANNOT win by getting {win_length} of the HUMAN's markers in a row
+- Always pay careful attention to which marker is yours in the current game
+
+The rules of Tic Tac Toe are:
+1. The board is a {size}x{size} grid numbered 0-{size*size-1}
+2. X always goes first, O always goes second
+3. Players take turns placing their marker on an empty space
+4. The first player to get {win_length} of their OWN markers in a row (horizontal, vertical, or diagonal) wins
+5. If all spaces are filled and no one has {win_length} in a row, the game is a tie
+
+CAREFUL ANALYSIS IS REQUIRED:
+- Take time to visualize the entire board layout
+- Check EVERY position on the board for both your markers and the human's markers
+- Scan ALL rows, columns, and both diagonals for potential winning lines or threats
+- Look for any sequences of {win_length - 1} markers that can be extended to {win_length}
+- Double-check your understanding before making your move
+- Check if the board size has changed since your last move
+- Being careful is more important than being quick
+
+{reply_instructions}"""
+    
+    # Generate the position numbers display
+    separator = "-" + "-+-".join(["-" for _ in range(size-1)]) + "-"
+    position_display = ""
+    for i in range(size):
+        row_positions = "|".join([str(i*size+j) for j in range(size)])
+        position_display += f"{row_positions}\n"
+        if i < size - 1:
+            position_display += f"{separator.strip()}\n"
+    legend = f"The board positions are numbered as follows:\n{position_display}"
+    
+    return (
+        {"type": "text", "text": system},
+        {"type": "text", "text": legend, "cache_control": CACHE_CONTROL},
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _prompt_template(size, ai_marker, human_marker, protocol, win_length=WIN_LENGTH):
+    # The user prompt around the board, plus the line drawn between board rows
+    separator = "-" + "-+-".join(["-" for _ in range(size-1)]) + "-"
+    
+    if protocol == PROTOCOL_TOOL:
+        format_instructions = f"""    Call the place_mark tool with your move and a 1-2 sentence reason.
+    The position must be a number 0-{size*size-1} of an empty position on the board."""
+    else:
+        format_instructions = f"""    Please explain your reasoning in 1-2 sentences, then provide your move.
+    Format your response like this:
+    
+    [reasoning] I am choosing position X because... [/reasoning]
+    
+    X
+    
+    Where X is a single number 0-{size*size-1} representing an empty position on the board."""
+    
+    head = f"""
+    We're playing Tic Tac Toe on a {size}x{size} board. YOU are playing as '{ai_marker}' and I (the human) am playing as '{human_marker}'.
+    
+    IMPORTANT: To be absolutely clear:
+    - All '{ai_marker}' marks on the board are YOUR marks
+    - All '{human_marker}' marks on the board are MY marks (the human player)
+    - You can only win by getting {win_length} '{ai_marker}' marks in a row (not {size})
+    - I can only win by getting {win_length} '{human_marker}' marks in a row (not {size})
+    - You cannot use my '{human_marker}' marks to form your winning line
+    
+    CRITICAL: Take your time to carefully read and understand the current board state. 
+    Look at EACH position to identify ALL '{human_marker}' and '{ai_marker}' markers.
+    Check for potential winning lines of {win_length} in ALL directions (rows, columns, and diagonals).
+    
+    The current board state is:
+    
+"""
+    tail = f"""
+    
+    It's your turn. Make your move by placing another '{ai_marker}' mark on the board.
+    Choose the index number (0-{size*size-1}) of an empty position,
+    using the position numbers given in the instructions.
+    
+{format_instructions}
+    """
+    return f"    {separator}\n", head, tail
+
+
+@functools.lru_cache(maxsize=None)
+def _sdk_takes_temperature():
+    # Recent SDKs reject the argument before sending anything; without the
+    # SDK (stub clients, benchmarks) it is harmless to send
+    try:
+        from anthropic.resources.messages import Messages
+    except ImportError:
+        return True
+    return "temperature" in inspect.signature(Messages.create).parameters
+
+
+def build_request(board, ai_marker, human_marker, protocol=PROTOCOL_TOOL):
+    # Keyword arguments for client.messages.create / client.messages.stream.
+    # Only the board rows are built per call; the rest comes from templates
+    # built once per board size, win length, marker pair and protocol.
+    size = board.size
+    separator, head, tail = _prompt_template(size, ai_marker, human_marker, protocol, board.win_length)
+    board_str = separator.join(
+        "    " + "|".join(board[i*size:(i+1)*size]) + "\n" for i in range(size)
+    )
+    
+    request = dict(
+        model=MODEL,
+        max_tokens=MAX_TOKENS[protocol],
+        system=list(_system_blocks(size, protocol, board.win_length)),
+        messages=[
+            {"role": "user", "content": head + board_str + tail}
+        ]
+    )
+    if _sdk_takes_temperature():
+        request["temperature"] = TEMPERATURE
+    if protocol == PROTOCOL_TOOL:
+        request["tools"] = [PLACE_MARK_TOOL]
+        request["tool_choice"] = {"type": "tool", "name": PLACE_MARK_TOOL["name"]}
+    return request
+
+
+def _tool_call(message):
+    for block in message.content:
+        if block.type == "tool_use" and block.name == PLACE_MARK_TOOL["name"]:
+            return block
+    return None
+
+
+def _check_position(position, board):
+    # Error message for the model, or None if the position can be played
+    if not isinstance(position, int) or isinstance(position, bool):
+        return f"position must be an integer, got {position!r}."
+    if not 0 <= position < len(board):
+        return f"position {position} is off the board; use 0-{len(board) - 1}."
+    if not board.is_empty(position):
+        return f"position {position} is already taken. Empty positions: {board.empty_cells()}."
+    return None
+
+
+def _add_usage(total, usage):
+    if usage is None:
+        return total
+    counts = {key: value for key, value in usage.model_dump().items() if isinstance(value, int)}
+    if total is None:
+        return counts
+    return {key: total.get(key, 0) + counts.get(key, 0) for key in set(total) | set(counts)}
+
+
+def _first_tool_reply(message, board):
+    # (block, position, reasoning, error) for the place_mark call in a reply.
+    # block is None when there is no call; error is None when the position
+    # can be played, otherwise the message to send back to the model.
+    block = _tool_call(message)
+    if block is None:
+        return None, None, "", None
+    position = block.input.get("position")
+    reasoning = str(block.input.get("reasoning", "")).strip()
+    return block, position, reasoning, _check_position(position, board)
+
+
+def _reask_request(request, message, block, error):
+    # The request again, with the invalid call answered by a tool error
+    logger.debug("Invalid place_mark call (%s), asking again", error)
+    retry = dict(request)
+    retry["messages"] = request["messages"] + [
+        {"role": "assistant", "content": message.content},
+        {"role": "user", "content": [
+            {"type": "tool_result", "tool_use_id": block.id, "content": error, "is_error": True}
+        ]},
+    ]
+    return retry
+
+
+def _second_tool_reply(message, board, reasoning):
+    # (move, reasoning) from the reply to a re-ask; no second chance this time
+    block = _tool_call(message)
+    if block is None or _check_position(block.input.get("position"), board) is not None:
+        return None, reasoning
+    return block.input["position"], str(block.input.get("reasoning", "")).strip()
+
+
+def _count_reask(timings, reask_start):
+    # Move the re-ask's time from "parse" to "api", and keep it as "reask" too
+    # so re-asks are counted
+    if timings is not None:
+        reask = time.perf_counter() - reask_start
+        timings["api"] += reask
+        timings["parse"] -= reask
+        timings["reask"] = reask
+
+
+def _read_tool_reply(client, request, message, board, timings=None):
+    # (move, reasoning, usage) from a place_mark call. An invalid or taken
+    # position is sent back as a tool error and the model is asked once more;
+    # that call's time is moved from "parse" to "api" in timings.
+    usage = _add_usage(None, message.usage)
+    block, position, reasoning, error = _first_tool_reply(message, board)
+    if error is None:
+        return position, reasoning, usage
+    reask_start = time.perf_counter()
+    message = client.messages.create(**_reask_request(request, message, block, error))
+    _count_reask(timings, reask_start)
+    return (*_second_tool_reply(message, board, reasoning), _add_usage(usage, message.usage))
+
+
+async def _read_tool_reply_async(client, request, message, board, timings=None):
+    # _read_tool_reply with an AsyncAnthropic client
+    usage = _add_usage(None, message.usage)
+    block, position, reasoning, error = _first_tool_reply(message, board)
+    if error is None:
+        return position, reasoning, usage
+    reask_start = time.perf_counter()
+    message = await client.messages.create(**_reask_request(request, message, block, error))
+    _count_reask(timings, reask_start)
+    return (*_second_tool_reply(message, board, reasoning), _add_usage(usage, message.usage))
+
+
+def _read_text_reply(response, board):
+    full_response = response.content[0].text.strip()
+    logger.debug("Full Claude response: %s", full_response)
+    move, reasoning = parse_response(full_response, board)
+    return move, reasoning, _add_usage(None, response.usage)
+
+
+def request_move(client, board, ai_marker, human_marker, protocol=PROTOCOL_TOOL):
+    # Ask for a move and wait for the complete reply
+    started = time.perf_counter()
+    request = build_request(board, ai_marker, human_marker, protocol)
+    start = time.perf_counter()
+    response = client.messages.create(**request)
+    received = time.perf_counter()
+    timings = {"prompt": start - started, "api": received - start, "parse": 0.0}
+
+    if protocol == PROTOCOL_TOOL:
+        move, reasoning, usage = _read_tool_reply(client, request, response, board, timings)
+    else:
+        move, reasoning, usage = _read_text_reply(response, board)
+    end = time.perf_counter()
+    timings["parse"] += end - received
+    elapsed = end - start
+    return MoveReply(move, reasoning, elapsed, elapsed, usage, timings)
+
+
+async def request_move_async(client, board, ai_marker, human_marker, protocol=PROTOCOL_TOOL):
+    # request_move with an AsyncAnthropic client
+    started = time.perf_counter()
+    request = build_request(board, ai_marker, human_marker, protocol)
+    start = time.perf_counter()
+    response = await client.messages.create(**request)
+    received = time.perf_counter()
+    timings = {"prompt": start - started, "api": received - start, "parse": 0.0}
+
+    if protocol == PROTOCOL_TOOL:
+        move, reasoning, usage = await _read_tool_reply_async(client, request, response, board, timings)
+    else:
+        move, reasoning, usage = _read_text_reply(response, board)
+    end = time.perf_counter()
+    timings["parse"] += end - received
+    elapsed = end - start
+    return MoveReply(move, reasoning, elapsed, elapsed, usage, timings)
+
+
+class _StreamFollower:
+    # Reads the events of a streamed reply for stream_move and
+    # stream_move_async. Free-text replies are parsed as they arrive; time
+    # spent in the parser and in on_reasoning is kept out of the "api" timing.
+
+    def __init__(self, board, on_reasoning, prompt_seconds):
+        self.parser = StreamingMoveParser(board)
+        self.on_reasoning = on_reasoning
+        self.start = time.perf_counter()
+        self.timings = {"prompt": prompt_seconds, "api": 0.0, "parse": 0.0, "callback": 0.0}
+        self.first_token = None
+        self.received = None
+
+    def feed(self, event):
+        # True once the move is known, so the stream can be left early
+        if event.type == "text":
+            if self.first_token is None:
+                self.first_token = time.perf_counter() - self.start
+            parse_start = time.perf_counter()
+            move = self.parser.feed(event.text)
+            callback_start = time.perf_counter()
+            self.timings["parse"] += callback_start - parse_start
+            if self.on_reasoning is not None and self.parser.reasoning:
+                self.on_reasoning(self.parser.reasoning)
+            self.timings["callback"] += time.perf_counter() - callback_start
+            return move is not None
+        if event.type == "input_json":
+            if self.first_token is None:
+                self.first_token = time.perf_counter() - self.start
+            callback_start = time.perf_counter()
+            reasoning = event.snapshot.get("reasoning") if isinstance(event.snapshot, dict) else None
+            if self.on_reasoning is not None and reasoning:
+                self.on_reasoning(reasoning)
+            self.timings["callback"] += time.perf_counter() - callback_start
+        return False
+
+    def stream_ended(self):
+        # Time the stream was read, for the "api" timing
+        self.received = time.perf_counter()
+        self.timings["api"] = self.received - self.start - self.timings["parse"] - self.timings["callback"]
+
+    def text_reply(self, message):
+        logger.debug("Streamed Claude response: %s", self.parser.text)
+        move, reasoning = self.parser.finish()
+        return move, reasoning, _add_usage(None, message.usage)
+
+    def reply(self, move, reasoning, usage):
+        end = time.perf_counter()
+        self.timings["parse"] += end - self.received
+        return MoveReply(move, reasoning, self.first_token, end - self.start, usage, self.timings)
+
+
+def stream_move(client, board, ai_marker, human_marker, on_reasoning=None, protocol=PROTOCOL_TOOL):
+    # Ask for a move and follow the reply as it streams. on_reasoning is
+    # called with the reasoning so far. Free-text replies are parsed as they
+    # arrive and the stream is left as soon as the move is known.
+    started = time.perf_counter()
+    request = build_request(board, ai_marker, human_marker, protocol)
+    follower = _StreamFollower(board, on_reasoning, time.perf_counter() - started)
+    with client.messages.stream(**request) as stream:
+        for event in stream:
+            if follower.feed(event):
+                # Leaving the block closes the stream without waiting for the rest
+                break
+        message = stream.current_message_snapshot
+
+    follower.stream_ended()
+    if protocol == PROTOCOL_TOOL:
+        return follower.reply(*_read_tool_reply(client, request, message, board, follower.timings))
+    return follower.reply(*follower.text_reply(message))
+
+
+async def stream_move_async(client, board, ai_marker, human_marker, on_reasoning=None, protocol=PROTOCOL_TOOL):
+    # stream_move with an AsyncAnthropic client
+    started = time.perf_counter()
+    request = build_request(board, ai_marker, human_marker, protocol)
+    follower = _StreamFollower(board, on_reasoning, time.perf_counter() - started)
+    async with client.messages.stream(**request) as stream:
+        async for event in stream:
+            if follower.feed(event):
+                break
+        message = stream.current_message_snapshot
+
+    follower.stream_ended()
+    if protocol == PROTOCOL_TOOL:
+        return follower.reply(*await _read_tool_reply_async(client, request, message, board, follower.timings))
+    return follower.reply(*follower.text_reply(message))
@@ -0,0 +1,123 @@
+# Game state and rules, without any UI.
+#
+# Game holds the board, whose turn it is, the result and the running score,
+# which the Streamlit app used to keep as separate session-state keys. The
+# app, simulations, engines and benchmarks all drive the same rules through
+# it without importing Streamlit or the Anthropic SDK.
+
+import random
+
+from .bitboard import BitBoard, MARKERS, MIN_WIN_LENGTH, WIN_LENGTH
+
+TIE = "Tie"
+
+
+def other_marker(marker):
+    return "O" if marker == "X" else "X"
+
+
+class Game:
+    __slots__ = (
+        "size", "win_length", "board", "current_player", "human_marker", "ai_marker",
+        "game_over", "winner", "game_count", "human_score", "ai_score", "ties",
+    )
+
+    def __init__(self, size=3, human_marker="X", first_player=None, win_length=WIN_LENGTH):
+        self.size = int(size)
+        self.win_length = min(int(win_length), self.size)
+        self.board = BitBoard(self.size, win_length=self.win_length)
+        self.human_marker = human_marker
+        self.ai_marker = other_marker(human_marker)
+        self.current_player = first_player or random.choice(MARKERS)
+        self.game_over = False
+        self.winner = None
+        self.game_count = 1
+        self.human_score = 0
+        self.ai_score = 0
+        self.ties = 0
+
+    def __repr__(self):
+        return (
+            f"Game(size={self.size}, win_length={self.win_length}, board={self.board!r}, current_player={self.current_player!r}, "
+            f"winner={self.winner!r}, score={self.human_score}-{self.ai_score}-{self.ties})"
+        )
+
+    @property
+    def is_human_turn(self):
+        return not self.game_over and self.current_player == self.human_marker
+
+    @property
+    def is_ai_turn(self):
+        return not self.game_over and self.current_player == self.ai_marker
+
+    def check_winner(self, index=None):
+        # With the index of the last move only the lines through it are checked,
+        # which gives the same answer on a board that had no winner before it
+        if index is None:
+            return self.board.winner()
+        return self.board.winner_at(index)
+
+    def make_move(self, index):
+        # Play the current player's marker at index and update the result and
+        # score. Returns False, changing nothing, if the move is not allowed.
+        if self.game_over or not 0 <= index < len(self.board) or not self.board.is_empty(index):
+            return False
+        self.board.play(index, self.current_player)
+
+        winner = self.check_winner(index)
+        if winner:
+            self._finish(winner)
+        else:
+            self.current_player = other_marker(self.current_player)
+        return True
+
+    def _finish(self, winner):
+        self.game_over = True
+        self.winner = winner
+        if winner == TIE:
+            self.ties += 1
+        elif winner == self.human_marker:
+            self.human_score += 1
+        else:
+            self.ai_score += 1
+
+    def _check_rebuilt_board(self):
+        # A new size or line length can complete a line (or fill the board)
+        # without a move, which make_move's check of the last move never sees
+        if not self.game_over:
+            winner = self.board.winner()
+            if winner:
+                self._finish(winner)
+
+    def reset(self, first_player=None):
+        # Start the next game on an empty board of the current size; the
+        # score carries over
+        self.board = BitBoard(self.size, win_length=self.win_length)
+        self.current_player = first_player or random.choice(MARKERS)
+        self.game_over = False
+        self.winner = None
+        self.game_count += 1
+
+    def resize(self, new_size):
+        # Change the board size, keeping the marks that still fit. The line
+        # length shrinks with the board if it no longer fits.
+        self.size = int(new_size)
+        self.win_length = max(MIN_WIN_LENGTH, min(self.win_length, self.size))
+        self.board = self.board.resized(self.size, self.win_length)
+        self._check_rebuilt_board()
+
+    def set_win_length(self, win_length):
+        # Change how many marks in a row win, for the game on the board too
+        self.win_length = max(MIN_WIN_LENGTH, min(int(win_length), self.size))
+        self.board = self.board.resized(self.size, self.win_length)
+        self._check_rebuilt_board()
+
+    def set_human_marker(self, marker):
+        self.human_marker = marker
+        self.ai_marker = other_marker(marker)
+
+    def reset_scores(self):
+        self.human_score = 0
+        self.ai_score = 0
+        self.ties = 0
+        self.game_count = 1
@@ -0,0 +1,208 @@
+# Monte Carlo tree search engine for boards too large to search exhaustively.
+#
+# UCT over the bitboard masks: each playout walks down the tree by the UCB1
+# score, adds one node, then finishes the game with random moves, checking
+# only the lines through each new mark. Root parallelism spreads the work
+# over a process pool: every worker grows its own tree from the same position
+# with its own seed for the whole budget, and the visit counts of the root
+# moves are added up. The pool is meant to be created once (create_pool) and
+# reused for every move, so workers keep their per-size tables between turns.
+
+import math
+import multiprocessing
+import os
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from .bitboard import WIN_LENGTH, CELL_MASKS, FULL_MASKS, iter_bits
+from .search import CELL_ORDER, NEIGHBOUR_MASKS
+
+# Default thinking time per AI move, in seconds
+DEFAULT_TIME_BUDGET = 1.0
+
+# UCB1 exploration constant
+EXPLORATION = 1.4
+
+# How often (in playouts) the clock is checked
+TIME_CHECK_INTERVAL = 64
+
+# Boards larger than this only consider cells near existing marks, as in search.py
+NEAR_MOVES_MIN_SIZE = 5
+
+# Playouts count a tie as half a win
+TIE_RESULT = 2
+
+MCTSResult = namedtuple("MCTSResult", ["move", "visits", "win_rate", "playouts", "elapsed", "workers"])
+
+
+class _Node:
+    __slots__ = ("move", "player", "children", "untried", "visits", "wins", "winner")
+
+    def __init__(self, move, player, untried, winner=None):
+        self.move = move
+        # Side (0 or 1) that played `move`; wins are counted for this side
+        self.player = player
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0
+        # Set when the game is over at this node: the winning side or TIE_RESULT
+        self.winner = winner
+
+
+class _Tree:
+    def __init__(self, size, win_length, me, opp, rng):
+        self.size = size
+        self.cell_masks = CELL_MASKS[size, win_length]
+        self.full = FULL_MASKS[size]
+        self.order = CELL_ORDER[size, win_length]
+        self.neighbours = NEIGHBOUR_MASKS[size]
+        self.rng = rng
+        self.bits = (me, opp)
+        # The root's moves are made by side 0; the root itself by side 1
+        self.root = _Node(None, 1, self.candidates(me | opp))
+
+    def candidates(self, occupied):
+        empty = self.full & ~occupied
+        if occupied and self.size >= NEAR_MOVES_MIN_SIZE:
+            near = 0
+            for index in iter_bits(occupied):
+                near |= self.neighbours[index]
+            if empty & near:
+                empty &= near
+        moves = [index for index in self.order if empty >> index & 1]
+        self.rng.shuffle(moves)
+        return moves
+
+    def wins(self, bits, index):
+        for mask in self.cell_masks[index]:
+            if bits & mask == mask:
+                return True
+        return False
+
+    def playout(self):
+        bits = list(self.bits)
+        node = self.root
+        path = [node]
+
+        # Selection: follow the best UCB1 child while every move has been tried
+        while not node.untried and node.children and node.winner is None:
+            log_visits = math.log(node.visits)
+            best = None
+            best_score = -1.0
+            for child in node.children:
+                score = child.wins / child.visits + EXPLORATION * math.sqrt(log_visits / child.visits)
+                if score > best_score:
+                    best, best_score = child, score
+            node = best
+            bits[node.player] |= 1 << node.move
+            path.append(node)
+
+        # Expansion: add one untried move
+        if node.winner is None and node.untried:
+            move = node.untried.pop()
+            side = 1 - node.player
+            bits[side] |= 1 << move
+            occupied = bits[0] | bits[1]
+            if self.wins(bits[side], move):
+                winner = side
+            elif occupied == self.full:
+                winner = TIE_RESULT
+            else:
+                winner = None
+            child = _Node(move, side, self.candidates(occupied) if winner is None else [], winner)
+            node.children.append(child)
+            node = child
+            path.append(node)
+
+        # Simulation: random moves until someone completes a line
+        winner = node.winner
+        if winner is None:
+            side = 1 - node.player
+            empty = list(iter_bits(self.full & ~(bits[0] | bits[1])))
+            self.rng.shuffle(empty)
+            winner = TIE_RESULT
+            for index in empty:
+                bits[side] |= 1 << index
+                if self.wins(bits[side], index):
+                    winner = side
+                    break
+                side = 1 - side
+
+        # Backpropagation
+        for node in path:
+            node.visits += 1
+            if node.player == winner:
+                node.wins += 1.0
+            elif winner == TIE_RESULT:
+                node.wins += 0.5
+
+
+def search_root(size, win_length, me, opp, time_budget, seed):
+    # Grow one tree for `time_budget` seconds with `me` to move. Returns
+    # ({move: (visits, wins)} for the root's children, playouts). Runs in
+    # pool workers, so it takes and returns plain values.
+    deadline = time.perf_counter() + time_budget
+    tree = _Tree(size, win_length, me, opp, random.Random(seed))
+    playouts = 0
+    root = tree.root
+    while True:
+        tree.playout()
+        playouts += 1
+        if playouts % TIME_CHECK_INTERVAL == 0:
+            if time.perf_counter() > deadline:
+                break
+            if not root.untried and all(child.winner is not None for child in root.children):
+                # Every root move ends the game; nothing is left to sample
+                break
+    stats = {child.move: (child.visits, child.wins) for child in root.children}
+    return stats, playouts
+
+
+def _warm_up(size):
+    # Import the engine and build the common tables in a fresh worker
+    CELL_MASKS[size, WIN_LENGTH]
+    return os.getpid()
+
+
+def create_pool(workers=None):
+    # Process pool for root-parallel searches. Workers are spawned rather
+    # than forked, so they do not inherit the threads of a running server.
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    list(pool.map(_warm_up, [3] * workers))
+    return pool
+
+
+def find_mcts_move(board, marker, time_budget=DEFAULT_TIME_BUDGET, pool=None, workers=1, seed=None):
+    # Best move for `marker` on a BitBoard after `time_budget` seconds of
+    # playouts: the most visited root move over all trees. With a pool, one
+    # tree grows on each of `workers` processes (no more than the pool has);
+    # without one, a single tree grows in this process.
+    start = time.perf_counter()
+    me = board.bits(marker)
+    opp = board.occupied_mask() & ~me
+    if board.empty == 0:
+        return MCTSResult(None, 0, 0.0, 0, 0.0, 0)
+    if seed is None:
+        seed = random.randrange(1 << 30)
+
+    args = (board.size, board.win_length, me, opp, time_budget)
+    if pool is None:
+        results = [search_root(*args, seed)]
+    else:
+        futures = [pool.submit(search_root, *args, seed + worker) for worker in range(workers)]
+        results = [future.result() for future in futures]
+
+    totals = {}
+    playouts = 0
+    for stats, count in results:
+        playouts += count
+        for move, (visits, wins) in stats.items():
+            total_visits, total_wins = totals.get(move, (0, 0.0))
+            totals[move] = (total_visits + visits, total_wins + wins)
+
+    move, (visits, wins) = max(totals.items(), key=lambda item: item[1][0])
+    return MCTSResult(move, visits, wins / visits, playouts, time.perf_counter() - start, len(results))
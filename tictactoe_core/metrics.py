@@ -0,0 +1,132 @@
+# Lightweight timing spans and counters, with Prometheus and JSONL export.
+#
+# A Metrics object aggregates span durations (count, total and max seconds
+# per name) and integer counters. One can feed a parent, so a session's
+# metrics also add up into the process-wide ones. A disabled Metrics hands
+# out a shared no-op span and ignores counts, so instrumented code costs
+# next to nothing when nobody is looking.
+
+import contextlib
+import json
+import os
+import re
+import threading
+import time
+
+# Shared do-nothing context manager for disabled metrics
+NO_SPAN = contextlib.nullcontext()
+
+_UNSAFE_NAME = re.compile(r"[^a-zA-Z0-9_]")
+
+
+class _Span:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    def __init__(self, enabled=True, parent=None):
+        self.enabled = enabled
+        self.parent = parent
+        self._spans = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def span(self, name):
+        # Context manager that records how long its block took under `name`
+        if not self.enabled:
+            return NO_SPAN
+        return _Span(self, name)
+
+    def observe(self, name, seconds):
+        # Record a duration that was measured elsewhere
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                self._spans[name] = [1, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                if seconds > stats[2]:
+                    stats[2] = seconds
+        if self.parent is not None:
+            self.parent.observe(name, seconds)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+        if self.parent is not None:
+            self.parent.count(name, value)
+
+    def snapshot(self):
+        # {"spans": {name: {"count", "total", "max"}}, "counters": {name: value}}
+        with self._lock:
+            return {
+                "spans": {
+                    name: {"count": count, "total": total, "max": longest}
+                    for name, (count, total, longest) in sorted(self._spans.items())
+                },
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+
+
+def _metric_name(*parts):
+    return "_".join(_UNSAFE_NAME.sub("_", part) for part in parts if part)
+
+
+def to_prometheus(snapshot, prefix="tictactoe"):
+    # Prometheus text exposition format: spans as a seconds summary (sum,
+    # count) plus a max gauge, counters as *_total counters
+    lines = []
+    if snapshot["spans"]:
+        name = _metric_name(prefix, "span_seconds")
+        lines.append(f"# TYPE {name} summary")
+        for span, stats in snapshot["spans"].items():
+            lines.append(f'{name}_sum{{span="{span}"}} {stats["total"]:.6f}')
+            lines.append(f'{name}_count{{span="{span}"}} {stats["count"]}')
+        lines.append(f"# TYPE {name}_max gauge")
+        for span, stats in snapshot["spans"].items():
+            lines.append(f'{name}_max{{span="{span}"}} {stats["max"]:.6f}')
+    for counter, value in snapshot["counters"].items():
+        name = _metric_name(prefix, counter, "total")
+        lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def to_jsonl(snapshot, **labels):
+    # One JSON line with a timestamp, any labels, and the snapshot
+    return json.dumps({"time": time.time(), **labels, **snapshot}) + "\n"
+
+
+def write_prometheus(snapshot, path, prefix="tictactoe"):
+    # Replace a textfile-collector file in one step, so a scrape never reads half of it
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        f.write(to_prometheus(snapshot, prefix))
+    os.replace(temporary, path)
+
+
+def append_jsonl(snapshot, path, **labels):
+    with open(path, "a") as f:
+        f.write(to_jsonl(snapshot, **labels))
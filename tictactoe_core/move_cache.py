@@ -0,0 +1,94 @@
+# Cache of Claude's answers, keyed by symmetry-canonical position.
+#
+# Positions that are rotations or reflections of each other share one entry:
+# the move is stored on the canonical board and mapped back through the
+# symmetry on lookup. Keys come from the board's Zobrist hashes, so building
+# one does not depend on the board size. Entries live in a bounded in-memory LRU, optionally
+# backed by an SQLite file so answers survive restarts.
+
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from .bitboard import SYMMETRIES, INVERSE_SYMMETRIES
+
+DEFAULT_MAX_ENTRIES = 10000
+
+
+class MoveCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, db_path=None):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS moves "
+                "(key TEXT PRIMARY KEY, move INTEGER NOT NULL, reasoning TEXT NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def _key(board, ai_marker):
+        canon_hash, symmetry = board.canonical_hash()
+        # Hashes use all 64 bits, more than an SQLite integer holds
+        return f"{board.size}:{board.win_length}:{ai_marker}:{canon_hash:016x}", symmetry
+
+    def get(self, board, ai_marker):
+        # (move, reasoning) for this position, or None on a miss
+        key, symmetry = self._key(board, ai_marker)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            elif self._db is not None:
+                row = self._db.execute("SELECT move, reasoning FROM moves WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = row
+                    self._store(key, entry)
+                    self.hits += 1
+                    self.disk_hits += 1
+            if entry is None:
+                self.misses += 1
+                return None
+        move, reasoning = entry
+        return INVERSE_SYMMETRIES[board.size][symmetry][move], reasoning
+
+    def put(self, board, ai_marker, move, reasoning):
+        key, symmetry = self._key(board, ai_marker)
+        entry = (SYMMETRIES[board.size][symmetry][move], reasoning)
+        with self._lock:
+            self._store(key, entry)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO moves VALUES (?, ?, ?)", (key,) + entry)
+                self._db.commit()
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM moves")
+                self._db.commit()
@@ -0,0 +1,99 @@
+# Memory-mapped opening book for small boards.
+#
+# The book file (written by `python -m tictactoe_core.build_book`) holds the
+# best move and game value of every symmetry-reduced position it covers, as
+# fixed-size records sorted by key. Lookups binary-search the mapped file in
+# place, so nothing is parsed or copied per session, and because the mapping
+# lives in this module it is shared by every Streamlit session in the process.
+
+import mmap
+import os
+import struct
+import threading
+
+from .bitboard import canonical, INVERSE_SYMMETRIES, WIN_LENGTH
+
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.bin")
+
+MAGIC = b"TTTB"
+VERSION = 1
+
+# magic, version, number of sections
+HEADER = struct.Struct("<4sBB")
+# board size, number of records, offset of the first record
+SECTION = struct.Struct("<BII")
+# side-to-move mask, opponent mask, best move, game value for the side to move
+RECORD = struct.Struct("<QQBb")
+
+# Game values stored in the book, from the point of view of the side to move
+WIN, DRAW, LOSS = 1, 0, -1
+
+
+class OpeningBook:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, section_count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {VERSION} opening book")
+        self.sections = {}
+        for i in range(section_count):
+            size, count, offset = SECTION.unpack_from(self._map, HEADER.size + i * SECTION.size)
+            self.sections[size] = (count, offset)
+
+    def close(self):
+        self._map.close()
+
+    def _find(self, size, key):
+        count, offset = self.sections[size]
+        low, high = 0, count
+        while low < high:
+            mid = (low + high) // 2
+            me, opp, move, value = RECORD.unpack_from(self._map, offset + mid * RECORD.size)
+            if (me, opp) == key:
+                return move, value
+            if (me, opp) < key:
+                low = mid + 1
+            else:
+                high = mid
+        return None
+
+    def lookup(self, board, marker):
+        # Best move and game value for `marker` to play on a BitBoard, or None
+        # when the position is not in the book, which only covers WIN_LENGTH
+        # in a row
+        size = board.size
+        if size not in self.sections or board.win_length != WIN_LENGTH:
+            return None
+        me = board.bits(marker)
+        opp = board.occupied_mask() & ~me
+        canon_me, canon_opp, symmetry = canonical(me, opp, size)
+        found = self._find(size, (canon_me, canon_opp))
+        if found is None:
+            return None
+        move, value = found
+        # The stored move is on the canonical board; map it back
+        return INVERSE_SYMMETRIES[size][symmetry][move], value
+
+
+_book = None
+_book_lock = threading.Lock()
+
+
+def get_book(path=BOOK_PATH):
+    # The process-wide book, mapped on first use. Returns None when no book
+    # has been built.
+    global _book
+    if _book is None:
+        with _book_lock:
+            if _book is None and os.path.exists(path):
+                _book = OpeningBook(path)
+    return _book
+
+
+def lookup(board, marker):
+    book = get_book()
+    if book is None:
+        return None
+    return book.lookup(board, marker)
@@ -0,0 +1,266 @@
+# Shared, resilient access to Claude for AI moves.
+#
+# One Anthropic client (and so one pooled HTTP connection pool) is kept per
+# API key for the whole process. Calls go through a process-wide concurrency
+# limit, are retried with jittered exponential backoff on transient errors,
+# and are cut off by a circuit breaker once the API keeps failing, at which
+# point callers degrade to a local strategy until the breaker lets a trial
+# call through again. The same limits apply to calls made on an event loop
+# with the provider's AsyncAnthropic client.
+
+import asyncio
+import os
+import random
+import threading
+import time
+
+from . import claude_player
+from .search import find_best_move
+
+# Timeouts for connecting and for the whole response, in seconds
+CONNECT_TIMEOUT = float(os.getenv("CLAUDE_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.getenv("CLAUDE_READ_TIMEOUT", 30))
+
+# Retries after the first attempt, and the backoff between them
+MAX_RETRIES = int(os.getenv("CLAUDE_MAX_RETRIES", 2))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+
+# Consecutive failures that open the breaker, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("CLAUDE_BREAKER_THRESHOLD", 5))
+BREAKER_RESET_SECONDS = float(os.getenv("CLAUDE_BREAKER_RESET", 30))
+
+# Outbound calls allowed at once across the process, and how long to wait for a slot
+MAX_CONCURRENT_CALLS = int(os.getenv("CLAUDE_MAX_CONCURRENT", 16))
+SLOT_TIMEOUT = 10.0
+
+# How often a coroutine waiting for a call slot checks again, in seconds
+SLOT_POLL_INTERVAL = 0.05
+
+# HTTP status codes worth retrying
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class ConcurrencyLimitError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        # Closed lets everything through; half-open lets one trial call through
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        # A call ended without an answer either way (e.g. it was interrupted),
+        # so let the next caller make the trial instead
+        with self._lock:
+            if self.opened_at is not None:
+                self._trial_running = False
+
+
+# Limits outbound API calls for the whole process
+_call_slots = threading.BoundedSemaphore(MAX_CONCURRENT_CALLS)
+
+
+def is_retryable(error):
+    import anthropic
+    if isinstance(error, (anthropic.APIConnectionError, anthropic.APITimeoutError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and (status in RETRYABLE_STATUS or status >= 500)
+
+
+def backoff_delay(attempt):
+    # "Full jitter": anywhere between zero and the exponential cap
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+async def _acquire_slot_async():
+    # Wait for a call slot without blocking the event loop
+    deadline = time.monotonic() + SLOT_TIMEOUT
+    while not _call_slots.acquire(blocking=False):
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(SLOT_POLL_INTERVAL)
+    return True
+
+
+def _client_options(api_key):
+    import anthropic
+    return dict(
+        api_key=api_key,
+        timeout=anthropic.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        # Retries are handled here, with jitter and the breaker
+        max_retries=0,
+    )
+
+
+class MoveProvider:
+    def __init__(self, client, breaker=None, max_retries=MAX_RETRIES, async_client_factory=None):
+        self.client = client
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self._async_client_factory = async_client_factory
+        self._async_client = None
+
+    @property
+    def async_client(self):
+        # AsyncAnthropic client, created on first use. Its connection pool
+        # belongs to the event loop that first uses it, so async calls should
+        # all run on one loop, such as the AIWorker's.
+        if self._async_client is None:
+            self._async_client = self._async_client_factory()
+        return self._async_client
+
+    def _call(self, fn, *args):
+        if not _call_slots.acquire(timeout=SLOT_TIMEOUT):
+            raise ConcurrencyLimitError("too many Claude calls in flight")
+        try:
+            if not self.breaker.allow():
+                raise CircuitOpenError("Claude API circuit breaker is open")
+            attempt = 0
+            while True:
+                try:
+                    result = fn(self.client, *args)
+                except Exception as e:
+                    if attempt < self.max_retries and is_retryable(e):
+                        time.sleep(backoff_delay(attempt))
+                        attempt += 1
+                        continue
+                    self.breaker.record_failure()
+                    raise
+                except BaseException:
+                    # Stopped from outside, e.g. by a Streamlit rerun raised
+                    # from on_reasoning: not the API's fault
+                    self.breaker.release_trial()
+                    raise
+                self.breaker.record_success()
+                return result
+        finally:
+            _call_slots.release()
+
+    async def _call_async(self, fn, *args):
+        if not await _acquire_slot_async():
+            raise ConcurrencyLimitError("too many Claude calls in flight")
+        try:
+            if not self.breaker.allow():
+                raise CircuitOpenError("Claude API circuit breaker is open")
+            attempt = 0
+            while True:
+                try:
+                    result = await fn(self.async_client, *args)
+                except Exception as e:
+                    if attempt < self.max_retries and is_retryable(e):
+                        await asyncio.sleep(backoff_delay(attempt))
+                        attempt += 1
+                        continue
+                    self.breaker.record_failure()
+                    raise
+                except asyncio.CancelledError:
+                    # The app cancels jobs it no longer needs (reset, new size
+                    # or opponent), which says nothing about the API
+                    self.breaker.release_trial()
+                    raise
+                self.breaker.record_success()
+                return result
+        finally:
+            _call_slots.release()
+
+    def request_move(self, board, ai_marker, human_marker, protocol=claude_player.PROTOCOL_TOOL):
+        return self._call(claude_player.request_move, board, ai_marker, human_marker, protocol)
+
+    def stream_move(self, board, ai_marker, human_marker, on_reasoning=None, protocol=claude_player.PROTOCOL_TOOL):
+        return self._call(claude_player.stream_move, board, ai_marker, human_marker, on_reasoning, protocol)
+
+    async def request_move_async(self, board, ai_marker, human_marker, protocol=claude_player.PROTOCOL_TOOL):
+        return await self._call_async(claude_player.request_move_async, board, ai_marker, human_marker, protocol)
+
+    async def stream_move_async(self, board, ai_marker, human_marker, on_reasoning=None,
+                                protocol=claude_player.PROTOCOL_TOOL):
+        return await self._call_async(
+            claude_player.stream_move_async, board, ai_marker, human_marker, on_reasoning, protocol
+        )
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(api_key):
+    # The process-wide provider for an API key, creating its client on first use
+    with _providers_lock:
+        provider = _providers.get(api_key)
+        if provider is None:
+            import anthropic
+            provider = _providers[api_key] = MoveProvider(
+                anthropic.Anthropic(**_client_options(api_key)),
+                async_client_factory=lambda: anthropic.AsyncAnthropic(**_client_options(api_key))
+            )
+        return provider
+
+
+def peek_provider(api_key):
+    # The provider for an API key if one was created, without creating it
+    with _providers_lock:
+        return _providers.get(api_key)
+
+
+# Local strategies to play while the breaker is open, by name
+def _search_move(board, marker, time_budget):
+    return find_best_move(board, marker, time_budget).move
+
+
+def _first_empty_move(board, marker, time_budget):
+    empty_cells = board.empty_cells()
+    return empty_cells[0] if empty_cells else None
+
+
+DEGRADED_STRATEGIES = {
+    "search": _search_move,
+    "first-empty": _first_empty_move,
+}
+DEGRADED_STRATEGY = os.getenv("CLAUDE_DEGRADED_STRATEGY", "search")
@@ -0,0 +1,106 @@
+# Parsing of Claude's free-text move replies.
+#
+# Replies are expected to look like "[reasoning] ... [/reasoning] 4", but the
+# parser also copes with missing tags and stray numbers. StreamingMoveParser
+# applies the same rules to a reply as it streams in, so the move can be
+# committed as soon as it has been emitted.
+
+import re
+
+REASONING_OPEN = "[reasoning]"
+REASONING_CLOSE = "[/reasoning]"
+
+TRAILING_NUMBER = re.compile(r"(.*?)(\d+)\s*$", re.DOTALL)
+NUMBER = re.compile(r"\d+")
+
+
+def extract_reasoning(full_response):
+    if REASONING_OPEN in full_response and REASONING_CLOSE in full_response:
+        return full_response.split(REASONING_OPEN)[1].split(REASONING_CLOSE)[0].strip()
+    # Otherwise take any text before a trailing number (the move)
+    match = TRAILING_NUMBER.search(full_response)
+    if match:
+        possible_reasoning = match.group(1).strip()
+        # Only use if it's a reasonable length
+        if len(possible_reasoning) > 5:
+            return possible_reasoning
+    return ""
+
+
+def parse_move(full_response, board):
+    max_position = len(board) - 1
+
+    # First try to extract a possibly multi-digit number
+    for num_str in NUMBER.findall(full_response):
+        num = int(num_str)
+        if 0 <= num <= max_position and board.is_empty(num):
+            return num
+
+    # If that didn't work, try digit by digit
+    for char in full_response:
+        if char.isdigit() and int(char) <= max_position and board.is_empty(int(char)):
+            return int(char)
+
+    return None
+
+
+def parse_response(full_response, board):
+    # (move, reasoning) from a complete reply; move is None if none was valid
+    return parse_move(full_response, board), extract_reasoning(full_response)
+
+
+class StreamingMoveParser:
+    # Incremental parser for a streamed reply.
+    #
+    # feed() returns the move once a valid empty-cell index has been emitted
+    # after the closing reasoning tag. A number only counts once it is
+    # followed by another character or could not grow into a valid index,
+    # so "1" is not taken on an 8x8 board while "12" may still be coming.
+
+    def __init__(self, board):
+        self.board = board
+        self.max_position = len(board) - 1
+        self.text = ""
+        self.move = None
+        self._scan_from = None
+
+    def feed(self, chunk):
+        self.text += chunk
+        if self.move is None:
+            self._scan()
+        return self.move
+
+    def _scan(self):
+        if self._scan_from is None:
+            close = self.text.find(REASONING_CLOSE)
+            if close == -1:
+                return
+            self._scan_from = close + len(REASONING_CLOSE)
+
+        for match in NUMBER.finditer(self.text, self._scan_from):
+            number = int(match.group())
+            if match.end() == len(self.text) and number * 10 <= self.max_position:
+                # The number may continue in the next chunk
+                self._scan_from = match.start()
+                return
+            if number <= self.max_position and self.board.is_empty(number):
+                self.move = number
+                return
+        self._scan_from = len(self.text)
+
+    @property
+    def reasoning(self):
+        # Reasoning so far, including a reasoning block that is still open
+        start = self.text.find(REASONING_OPEN)
+        if start == -1:
+            return ""
+        start += len(REASONING_OPEN)
+        end = self.text.find(REASONING_CLOSE, start)
+        return (self.text[start:] if end == -1 else self.text[start:end]).strip()
+
+    def finish(self):
+        # (move, reasoning) once the stream has ended or been stopped, falling
+        # back to the complete-reply rules if no move was committed early
+        if self.move is None:
+            return parse_response(self.text, self.board)
+        return self.move, self.reasoning or extract_reasoning(self.text)
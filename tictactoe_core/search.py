@@ -0,0 +1,257 @@
+# Local alpha-beta search engine that can play the AI's side without an API call.
+#
+# Negamax with alpha-beta pruning over the bitboard masks, driven by iterative
+# deepening so that a move is always available when the time budget runs out.
+# Positions are stored in a transposition table keyed by a Zobrist hash of the
+# two player masks (side to move first), updated by XOR as moves are made, and
+# moves are ordered by the table's best move, then by how many winning lines
+# pass through each cell. The static score is carried down the tree and
+# updated from the lines through each move, so a leaf costs the same on any
+# board size.
+
+import time
+from collections import defaultdict, namedtuple
+
+from .bitboard import SizeTable, WIN_LENGTH, WIN_MASKS, CELL_MASKS, FULL_MASKS, ZOBRIST_KEYS, iter_bits, popcount
+
+# Default thinking time per AI move, in seconds
+DEFAULT_TIME_BUDGET = 1.0
+
+# Scores for finished games. Wins are offset by the number of empty cells left
+# so quicker wins score higher without the score depending on search depth
+WIN_SCORE = 10000
+INFINITY = 10 ** 9
+
+# Weights for lines holding only one player's marks, by number of marks, for
+# each win length: 0, 1, 10, 100, ...
+LINE_WEIGHTS = SizeTable(lambda win_length: (0,) + tuple(10 ** i for i in range(win_length)))
+
+# Transposition table bounds
+EXACT, LOWER, UPPER = 0, 1, 2
+MAX_TABLE_ENTRIES = 500000
+
+# How often (in nodes) the clock is checked on a 3x3 board. A node tries
+# every candidate cell, so larger boards check proportionally more often.
+TIME_CHECK_INTERVAL = 1024
+
+SearchResult = namedtuple("SearchResult", ["move", "score", "depth", "nodes", "elapsed", "complete"])
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def _build_cell_order(size, win_length=WIN_LENGTH):
+    # Cells with more winning lines through them first (centre before edges)
+    cell_masks = CELL_MASKS[size, win_length]
+    return tuple(sorted(range(size * size), key=lambda index: -len(cell_masks[index])))
+
+
+def _build_neighbour_masks(size, distance=2):
+    # Cells within `distance` rows and columns of each cell
+    masks = []
+    for index in range(size * size):
+        row, col = divmod(index, size)
+        mask = 0
+        for r in range(max(0, row - distance), min(size, row + distance + 1)):
+            for c in range(max(0, col - distance), min(size, col + distance + 1)):
+                mask |= 1 << (r * size + c)
+        masks.append(mask)
+    return tuple(masks)
+
+
+CELL_ORDER = SizeTable(_build_cell_order)
+NEIGHBOUR_MASKS = SizeTable(_build_neighbour_masks)
+
+# Transposition tables per (size, win_length), shared by every game in the process
+_tables = defaultdict(dict)
+
+
+def evaluate(me, opp, size, win_length=WIN_LENGTH):
+    # Static score from the point of view of the player owning `me`
+    weights = LINE_WEIGHTS[win_length]
+    score = 0
+    for mask in WIN_MASKS[size, win_length]:
+        mine = me & mask
+        theirs = opp & mask
+        if mine and not theirs:
+            score += weights[popcount(mine)]
+        elif theirs and not mine:
+            score -= weights[popcount(theirs)]
+    return score
+
+
+def evaluate_move(me, opp, index, size, win_length=WIN_LENGTH):
+    # How much playing `index` changes evaluate() for `me`. Only the lines
+    # through the cell change, so this costs the same on any board size.
+    weights = LINE_WEIGHTS[win_length]
+    new_me = me | 1 << index
+    delta = 0
+    for mask in CELL_MASKS[size, win_length][index]:
+        theirs = opp & mask
+        if not theirs:
+            delta += weights[popcount(new_me & mask)] - weights[popcount(me & mask)]
+        elif not me & mask:
+            # The line was theirs alone and now counts for nobody
+            delta += weights[popcount(theirs)]
+    return delta
+
+
+def position_keys(me, opp, size):
+    # Zobrist keys of the position with `me` to move and with `opp` to move.
+    # The X keys stand for the side to move and the O keys for the other
+    # side; after `me` plays at i, the new pair is
+    # (opp_key ^ O_KEYS[i], me_key ^ X_KEYS[i]).
+    mover, waiting = ZOBRIST_KEYS[size]["X"], ZOBRIST_KEYS[size]["O"]
+    me_key = opp_key = 0
+    for index in iter_bits(me):
+        me_key ^= mover[index]
+        opp_key ^= waiting[index]
+    for index in iter_bits(opp):
+        me_key ^= waiting[index]
+        opp_key ^= mover[index]
+    return me_key, opp_key
+
+
+def is_win(bits, index, size, win_length=WIN_LENGTH):
+    for mask in CELL_MASKS[size, win_length][index]:
+        if bits & mask == mask:
+            return True
+    return False
+
+
+class _Search:
+    def __init__(self, size, deadline, win_length=WIN_LENGTH):
+        self.size = size
+        self.win_length = win_length
+        self.deadline = deadline
+        self.table = _tables[size, win_length]
+        self.nodes = 0
+        self.check_interval = max(1, TIME_CHECK_INTERVAL * 9 // (size * size))
+        self.full = FULL_MASKS[size]
+        self.order = CELL_ORDER[size, win_length]
+        self.neighbours = NEIGHBOUR_MASKS[size]
+        self.mover_keys = ZOBRIST_KEYS[size]["X"]
+        self.waiting_keys = ZOBRIST_KEYS[size]["O"]
+
+    def near_mask(self, occupied):
+        near = 0
+        for index in iter_bits(occupied):
+            near |= self.neighbours[index]
+        return near
+
+    def candidate_moves(self, me, opp, first=None):
+        occupied = me | opp
+        empty = self.full & ~occupied
+        if occupied and self.size > 4:
+            # On larger boards only consider cells near existing marks
+            near = self.near_mask(occupied)
+            if empty & near:
+                empty &= near
+        moves = [index for index in self.order if empty >> index & 1]
+        if first is not None and first in moves:
+            moves.remove(first)
+            moves.insert(0, first)
+        return moves
+
+    def is_exhaustive(self, me, opp):
+        # Whether candidate_moves tries every empty cell at every node below
+        # this position. Marks only add to the cells near them, so that holds
+        # exactly when every empty cell is already near a mark.
+        if self.size <= 4:
+            return True
+        empty = self.full & ~(me | opp)
+        return not empty & ~self.near_mask(me | opp)
+
+    def negamax(self, me, opp, depth, alpha, beta, key, opp_key, static):
+        # `key` and `opp_key` are the position's Zobrist keys with `me` and
+        # with `opp` to move (see position_keys), `static` its evaluate()
+        # score for `me`
+        self.nodes += 1
+        if self.nodes % self.check_interval == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        entry = self.table.get(key)
+        best_move = None
+        if entry is not None:
+            entry_depth, entry_score, entry_flag, best_move = entry
+            if entry_depth >= depth:
+                if entry_flag == EXACT:
+                    return entry_score, best_move
+                if entry_flag == LOWER and entry_score >= beta:
+                    return entry_score, best_move
+                if entry_flag == UPPER and entry_score <= alpha:
+                    return entry_score, best_move
+
+        original_alpha = alpha
+        empties = popcount(self.full & ~(me | opp)) - 1
+        best_score = -INFINITY
+        for index in self.candidate_moves(me, opp, best_move):
+            new_me = me | (1 << index)
+            if is_win(new_me, index, self.size, self.win_length):
+                score = WIN_SCORE + empties
+            elif empties == 0:
+                score = 0
+            elif depth <= 1:
+                score = static + evaluate_move(me, opp, index, self.size, self.win_length)
+            else:
+                new_static = static + evaluate_move(me, opp, index, self.size, self.win_length)
+                score = -self.negamax(
+                    opp, new_me, depth - 1, -beta, -alpha,
+                    opp_key ^ self.waiting_keys[index], key ^ self.mover_keys[index], -new_static
+                )[0]
+
+            if score > best_score:
+                best_score = score
+                best_move = index
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        if len(self.table) >= MAX_TABLE_ENTRIES:
+            self.table.clear()
+        self.table[key] = (depth, best_score, flag, best_move)
+        return best_score, best_move
+
+
+def find_best_move(board, marker, time_budget=DEFAULT_TIME_BUDGET, max_depth=None):
+    # Search for `marker`'s best move on a BitBoard within `time_budget` seconds.
+    # Returns the move from the deepest completed iteration.
+    start = time.perf_counter()
+    size = board.size
+    me = board.bits(marker)
+    opp = board.occupied_mask() & ~me
+    empties = board.empty
+    if empties == 0:
+        return SearchResult(None, 0, 0, 0, 0.0, True)
+
+    search = _Search(size, start + time_budget, board.win_length)
+    keys = position_keys(me, opp, size)
+    static = evaluate(me, opp, size, board.win_length)
+    limit = empties if max_depth is None else min(max_depth, empties)
+    # A narrowed search can still stop at a win it found, but proves nothing
+    exhaustive = search.is_exhaustive(me, opp)
+    result = None
+    for depth in range(1, limit + 1):
+        try:
+            score, move = search.negamax(me, opp, depth, -INFINITY, INFINITY, *keys, static)
+        except SearchTimeout:
+            break
+        finished = depth >= empties or abs(score) >= WIN_SCORE
+        complete = finished and exhaustive
+        result = SearchResult(move, score, depth, search.nodes, time.perf_counter() - start, complete)
+        if finished:
+            break
+
+    if result is None:
+        # Not even one ply finished in time; play the best-ordered cell
+        move = search.candidate_moves(me, opp)[0]
+        result = SearchResult(move, 0, 0, search.nodes, time.perf_counter() - start, False)
+    return result
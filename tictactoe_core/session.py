@@ -0,0 +1,145 @@
+# Everything one player's browser session keeps between reruns.
+#
+# The app used to keep about fifteen separate st.session_state keys, with a
+# dict per AI move in a history that only "Play Again" cleared and a dict
+# per Claude call in the latency panel. Session holds the same state in
+# slots, keeps both histories as tuples in fixed-size ring buffers, and can
+# report how many bytes it holds, so the memory for N concurrent players
+# can be planned from one session's report.
+
+import sys
+import types
+from collections import namedtuple
+
+from .claude_player import PROTOCOL_TOOL
+from .search import DEFAULT_TIME_BUDGET
+
+# AI moves kept for the thoughts panel
+MOVE_HISTORY = 30
+
+# Claude calls kept for the latency panel
+LATENCY_HISTORY = 50
+
+# One AI move and the explanation shown for it
+MoveNote = namedtuple("MoveNote", ["move", "reasoning"])
+
+# Seconds from sending a Claude request to the first output and to the move,
+# and the tokens it took (input split into cache reads, cache writes and
+# uncached tokens)
+LatencySample = namedtuple("LatencySample", [
+    "protocol", "streamed", "first_token", "move",
+    "output_tokens", "input_tokens", "cache_read_tokens", "cache_write_tokens",
+])
+
+# Objects that belong to the interpreter rather than to a session
+_NOT_OWNED = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+class RingBuffer:
+    # The last `capacity` items appended, oldest first. The list grows up to
+    # the capacity and then the oldest item is overwritten in place.
+    __slots__ = ("capacity", "_items", "_start")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._items = []
+        self._start = 0
+
+    def append(self, item):
+        if len(self._items) < self.capacity:
+            self._items.append(item)
+        else:
+            self._items[self._start] = item
+            self._start = (self._start + 1) % self.capacity
+
+    def clear(self):
+        self._items = []
+        self._start = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        items = self._items
+        return iter(items[self._start:] + items[:self._start])
+
+    def __reversed__(self):
+        return reversed(list(self))
+
+    def __getitem__(self, position):
+        # Position from the oldest item, or from the newest if negative
+        count = len(self._items)
+        if not -count <= position < count:
+            raise IndexError("ring buffer index out of range")
+        return self._items[(self._start + position % count) % count]
+
+
+def deep_sizeof(value, shared=frozenset(), seen=None):
+    # Bytes held by `value` and everything it refers to, counting each object
+    # once and leaving out the objects whose ids are in `shared` (tables and
+    # pools that all sessions use) and classes, modules and functions
+    if seen is None:
+        seen = set()
+    if id(value) in seen or id(value) in shared or isinstance(value, _NOT_OWNED):
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += deep_sizeof(key, shared, seen) + deep_sizeof(item, shared, seen)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += deep_sizeof(item, shared, seen)
+    else:
+        for cls in type(value).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if hasattr(value, name):
+                    size += deep_sizeof(getattr(value, name), shared, seen)
+        if hasattr(value, "__dict__"):
+            size += deep_sizeof(vars(value), shared, seen)
+    return size
+
+
+class Session:
+    __slots__ = (
+        "game", "ai_mode", "ai_reasoning", "ai_move_history", "ai_latency", "last_click_id",
+        "local_time_budget", "use_opening_book", "stream_responses", "speculate", "move_protocol",
+        "background_turns", "ai_job", "api_calls_saved", "render_timings", "speculator", "metrics",
+    )
+
+    def __init__(self, game, ai_mode, speculator, metrics):
+        self.game = game
+        self.ai_mode = ai_mode
+        self.ai_reasoning = ""
+        self.ai_move_history = RingBuffer(MOVE_HISTORY)
+        self.ai_latency = RingBuffer(LATENCY_HISTORY)
+        # Id of the last board click that was played
+        self.last_click_id = None
+        self.local_time_budget = DEFAULT_TIME_BUDGET
+        self.use_opening_book = True
+        self.stream_responses = True
+        self.speculate = False
+        self.move_protocol = PROTOCOL_TOOL
+        # Whether Claude's moves are asked for on the background worker, and
+        # the MoveJob of the one in flight
+        self.background_turns = True
+        self.ai_job = None
+        self.api_calls_saved = 0
+        # Milliseconds the last run of each part of the page took
+        self.render_timings = {}
+        self.speculator = speculator
+        self.metrics = metrics
+
+    def memory_report(self):
+        # {field: bytes} for everything this session holds on its own, plus
+        # "total". The board's win-mask tables, the speculation pool and the
+        # process metrics are shared with other sessions and not counted.
+        board = self.game.board
+        shared = {
+            id(board._win_masks), id(board._cell_masks),
+            id(self.speculator.executor), id(self.metrics.parent),
+        }
+        seen = set()
+        report = {name: deep_sizeof(getattr(self, name), shared, seen) for name in self.__slots__}
+        report["total"] = sys.getsizeof(self) + sum(report.values())
+        return report
@@ -0,0 +1,106 @@
+# Speculative AI replies computed while the human is still deciding.
+#
+# When the human's turn begins, the AI's reply to each likely human move is
+# submitted to a shared thread pool. The pool's worker count caps how many
+# speculative API calls run at once across all sessions. Each session keeps
+# its own table of futures keyed by the position after the human's move;
+# the AI turn takes its answer from there when the human played one of them.
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from .search import evaluate_move
+
+# Boards up to this size get a reply precomputed for every empty cell
+SMALL_BOARD_MAX_SIZE = 4
+
+logger = logging.getLogger(__name__)
+
+# Number of candidate human moves on larger boards
+DEFAULT_TOP_N = 4
+
+# Longest wait, on the script thread, for a reply that is still in flight when
+# the AI's turn comes. A call that is not nearly done by then may be stuck, so
+# the caller asks afresh instead.
+RESULT_TIMEOUT = 1.0
+
+
+def create_executor(max_concurrent):
+    return ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="speculate")
+
+
+def likely_human_moves(board, human_marker, top_n=DEFAULT_TOP_N):
+    # Every empty cell on small boards, otherwise the top_n cells that score
+    # best for the human after a one-move look-ahead
+    cells = board.empty_cells()
+    if board.size <= SMALL_BOARD_MAX_SIZE:
+        return cells
+    human = board.bits(human_marker)
+    ai = board.occupied_mask() & ~human
+    scored = sorted(cells, key=lambda index: -evaluate_move(human, ai, index, board.size, board.win_length))
+    return scored[:top_n]
+
+
+def _position_key(board, ai_marker):
+    return (board.size, board.win_length, board.zobrist, ai_marker)
+
+
+class Speculator:
+    def __init__(self, executor):
+        self.executor = executor
+        self._futures = {}
+        self._started_for = None
+        self._lock = threading.Lock()
+
+    def start(self, board, ai_marker, human_marker, compute, top_n=DEFAULT_TOP_N):
+        # Submit compute(board_after_human_move) for the likely human moves.
+        # Does nothing if speculation already started for this position.
+        key = _position_key(board, ai_marker)
+        with self._lock:
+            if self._started_for == key:
+                return
+            self._cancel_locked()
+            self._started_for = key
+            for index in likely_human_moves(board, human_marker, top_n):
+                after = board.copy()
+                after.play(index, human_marker)
+                if after.winner_at(index):
+                    continue
+                self._futures[_position_key(after, ai_marker)] = self.executor.submit(compute, after)
+
+    def take(self, board, ai_marker):
+        # The speculative result for this position, waiting up to
+        # RESULT_TIMEOUT if it is still in flight, or None if it was never
+        # requested, failed or is not ready by then
+        with self._lock:
+            future = self._futures.pop(_position_key(board, ai_marker), None)
+            self._cancel_locked()
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=RESULT_TIMEOUT)
+        except FutureTimeout:
+            # Left to finish on its worker; its result is discarded
+            logger.debug("Speculative move not ready after %.1fs", RESULT_TIMEOUT)
+            return None
+        except Exception as e:
+            logger.debug("Speculative move failed: %s", e)
+            return None
+
+    def cancel(self):
+        # Drop every pending result, e.g. when the game resets or the board resizes
+        with self._lock:
+            self._cancel_locked()
+
+    def _cancel_locked(self):
+        # Calls that have not started are cancelled; running ones finish and
+        # their results are discarded
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+        self._started_for = None
+
+    def pending(self):
+        with self._lock:
+            return sum(1 for future in self._futures.values() if not future.done())
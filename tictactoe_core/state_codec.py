@@ -0,0 +1,148 @@
+# Compact, tamper-evident encoding of a Game for URLs.
+#
+# The whole game fits in a short base64url token, so any server can resume
+# it from the link alone without sticky sessions or shared storage:
+#
+#   version     1 byte
+#   size        1 byte
+#   win length  1 byte (not in version 1 tokens, which are all three in a row)
+#   flags       1 byte: human marker, player to move, game over, winner (2 bits)
+#   scores      game count, human, AI and ties as unsigned LEB128 varints
+#   board       2 bits per cell (0 empty, 1 X, 2 O), cell 0 in the lowest bits
+#   tag         HMAC-SHA256 of everything before it, truncated to TAG_BYTES
+#
+# An 8x8 game with scores under 128 encodes to 40 bytes, 54 URL characters;
+# a 19x19 game to 115 bytes, 154 characters.
+
+import base64
+import hashlib
+import hmac
+
+from .bitboard import BitBoard, MIN_SIZE, MAX_SIZE, MIN_WIN_LENGTH, WIN_LENGTH, iter_bits
+from .game import Game, TIE
+
+VERSION = 2
+TAG_BYTES = 16
+
+_WINNERS = (None, "X", "O", TIE)
+
+
+class InvalidState(ValueError):
+    pass
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return out
+
+
+def _read_varint(data, offset):
+    value = shift = 0
+    while True:
+        if offset >= len(data) or shift > 63:
+            raise InvalidState("truncated score")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+def _pack_board(board):
+    packed = 0
+    for index in iter_bits(board.x):
+        packed |= 1 << 2 * index
+    for index in iter_bits(board.o):
+        packed |= 2 << 2 * index
+    return packed.to_bytes(_board_bytes(board.size), "little")
+
+
+def _unpack_board(data, size, win_length):
+    packed = int.from_bytes(data, "little")
+    x = o = 0
+    for index in range(size * size):
+        code = packed >> 2 * index & 3
+        if code == 1:
+            x |= 1 << index
+        elif code == 2:
+            o |= 1 << index
+        elif code == 3:
+            raise InvalidState(f"invalid cell code at {index}")
+    return BitBoard(size, x, o, win_length)
+
+
+def _board_bytes(size):
+    return (2 * size * size + 7) // 8
+
+
+def _tag(key, payload):
+    return hmac.new(key, payload, hashlib.sha256).digest()[:TAG_BYTES]
+
+
+def encode(game, key):
+    # URL-safe token for the game, signed with `key` (bytes)
+    flags = (
+        (game.human_marker == "O")
+        | (game.current_player == "O") << 1
+        | game.game_over << 2
+        | _WINNERS.index(game.winner) << 3
+    )
+    payload = bytearray((VERSION, game.size, game.win_length, flags))
+    for value in (game.game_count, game.human_score, game.ai_score, game.ties):
+        payload += _varint(value)
+    payload += _pack_board(game.board)
+    payload = bytes(payload)
+    return base64.urlsafe_b64encode(payload + _tag(key, payload)).rstrip(b"=").decode("ascii")
+
+
+def decode(token, key):
+    # The Game in a token from encode(); raises InvalidState if the token is
+    # malformed, from another key or has been changed
+    try:
+        data = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (ValueError, TypeError):
+        raise InvalidState("not base64url") from None
+    if len(data) < 4 + TAG_BYTES:
+        raise InvalidState("too short")
+    payload, tag = data[:-TAG_BYTES], data[-TAG_BYTES:]
+    if not hmac.compare_digest(tag, _tag(key, payload)):
+        raise InvalidState("integrity check failed")
+
+    version, size = payload[0], payload[1]
+    if version == 1:
+        win_length, offset = WIN_LENGTH, 2
+    elif version == VERSION:
+        win_length, offset = payload[2], 3
+    else:
+        raise InvalidState(f"unsupported version {version}")
+    flags = payload[offset]
+    offset += 1
+    if not MIN_SIZE <= size <= MAX_SIZE:
+        raise InvalidState(f"unsupported board size {size}")
+    if not MIN_WIN_LENGTH <= win_length <= size:
+        raise InvalidState(f"unsupported win length {win_length}")
+    if flags >> 3 >= len(_WINNERS):
+        raise InvalidState("invalid flags")
+
+    scores = []
+    for _ in range(4):
+        value, offset = _read_varint(payload, offset)
+        scores.append(value)
+    if len(payload) - offset != _board_bytes(size):
+        raise InvalidState("board length does not match its size")
+
+    game = Game(size, human_marker="O" if flags & 1 else "X", first_player="O" if flags >> 1 & 1 else "X",
+                win_length=win_length)
+    game.board = _unpack_board(payload[offset:], size, win_length)
+    game.game_over = bool(flags >> 2 & 1)
+    game.winner = _WINNERS[flags >> 3]
+    game.game_count, game.human_score, game.ai_score, game.ties = scores
+    return game
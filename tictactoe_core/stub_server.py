@@ -0,0 +1,218 @@
+# Local stand-in for the Anthropic Messages API, for tournaments and tests.
+#
+# Answers POST /v1/messages the way Claude answers the move prompt: with a
+# place_mark tool call when the request offers the tool, otherwise with the
+# "[reasoning] ... [/reasoning] N" text format. The board is read back from
+# the prompt and the stub plays a random empty cell, after an optional
+# delay, so the whole request/parse path runs without network or API key.
+# Streaming requests get the same reply as server-sent events, and a share
+# of requests can be failed with 529 "overloaded" errors for load tests.
+#
+#     python -m tictactoe_core.stub_server --port 8765 --latency 0.5 --error-rate 0.05
+#
+# Point a client at it with base_url="http://127.0.0.1:8765".
+
+import argparse
+import itertools
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .bitboard import BitBoard
+
+BOARD_SIZE = re.compile(r"on a (\d+)x\1 board")
+BOARD_ROW = re.compile(r"^ {4}([XO ](?:\|[XO ])*)$", re.MULTILINE)
+
+# Pieces the tool input JSON and the reply text are streamed in
+STREAM_CHUNKS = 4
+
+_ids = itertools.count(1)
+
+
+def read_board(prompt):
+    # The board drawn in a move prompt, or None if there is none
+    size_match = BOARD_SIZE.search(prompt)
+    if size_match is None:
+        return None
+    size = int(size_match.group(1))
+    cells = []
+    for row in BOARD_ROW.findall(prompt):
+        row_cells = row.split("|")
+        if len(row_cells) == size:
+            cells.extend(row_cells)
+    if len(cells) != size * size:
+        return None
+    return BitBoard.from_list(cells)
+
+
+def _prompt_text(request):
+    # Text of the first user message, which carries the board
+    content = request["messages"][0]["content"]
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+
+def build_reply(request, rng=random):
+    # Messages API response body for a move request
+    board = read_board(_prompt_text(request))
+    empty_cells = board.empty_cells() if board is not None else []
+    move = rng.choice(empty_cells) if empty_cells else 0
+    reasoning = "The stub picks a random empty position."
+
+    if request.get("tools"):
+        tool = request["tools"][0]["name"]
+        content = [{
+            "type": "tool_use",
+            "id": f"toolu_stub_{next(_ids)}",
+            "name": tool,
+            "input": {"reasoning": reasoning, "position": move},
+        }]
+        stop_reason = "tool_use"
+    else:
+        content = [{"type": "text", "text": f"[reasoning] {reasoning} [/reasoning]\n\n{move}"}]
+        stop_reason = "end_turn"
+
+    return {
+        "id": f"msg_stub_{next(_ids)}",
+        "type": "message",
+        "role": "assistant",
+        "model": request.get("model", "stub"),
+        "content": content,
+        "stop_reason": stop_reason,
+        "stop_sequence": None,
+        "usage": {
+            "input_tokens": len(json.dumps(request)) // 4,
+            "output_tokens": 20,
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0,
+        },
+    }
+
+
+def _chunks(text, count=STREAM_CHUNKS):
+    step = max(1, -(-len(text) // count))
+    return [text[start:start + step] for start in range(0, len(text), step)]
+
+
+def stream_events(reply):
+    # (event, data) pairs that stream `reply` the way the Messages API does
+    content = reply["content"]
+    message = dict(reply, content=[], stop_reason=None, usage=dict(reply["usage"], output_tokens=1))
+    yield "message_start", {"type": "message_start", "message": message}
+    for index, block in enumerate(content):
+        if block["type"] == "tool_use":
+            start = dict(block, input={})
+            deltas = [{"type": "input_json_delta", "partial_json": part} for part in _chunks(json.dumps(block["input"]))]
+        else:
+            start = {"type": "text", "text": ""}
+            deltas = [{"type": "text_delta", "text": part} for part in _chunks(block["text"])]
+        yield "content_block_start", {"type": "content_block_start", "index": index, "content_block": start}
+        for delta in deltas:
+            yield "content_block_delta", {"type": "content_block_delta", "index": index, "delta": delta}
+        yield "content_block_stop", {"type": "content_block_stop", "index": index}
+    yield "message_delta", {
+        "type": "message_delta",
+        "delta": {"stop_reason": reply["stop_reason"], "stop_sequence": None},
+        "usage": {"output_tokens": reply["usage"]["output_tokens"]},
+    }
+    yield "message_stop", {"type": "message_stop"}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if not self.path.split("?")[0].endswith("/v1/messages"):
+            self._send(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.record_request():
+            self._send(529, {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded (stub)"}})
+            return
+        reply = build_reply(request, self.server.rng)
+        if request.get("stream"):
+            self._stream(reply)
+        else:
+            self._send(200, reply)
+
+    def _stream(self, reply):
+        # Server-sent events without a length, so the connection ends the stream
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        for event, data in stream_events(reply):
+            self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode())
+            self.wfile.flush()
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, seed=None, error_rate=0.0):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        # Count a request; True if it should fail
+        with self._lock:
+            self.requests += 1
+            failed = self.error_rate > 0 and self.rng.random() < self.error_rate
+            self.errors += failed
+            return failed
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+def start(port=0, latency=0.0, seed=None, error_rate=0.0):
+    # Serve on a background thread and return the server; port 0 picks a free one
+    server = StubServer(port, latency, seed, error_rate)
+    threading.Thread(target=server.serve_forever, name="stub-server", daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a stand-in for the Anthropic Messages API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before each reply")
+    parser.add_argument("--seed", type=int, help="seed for the stub's moves")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 529 error")
+    args = parser.parse_args(argv)
+    server = StubServer(args.port, args.latency, args.seed, args.error_rate)
+    print(f"Stub Messages API on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
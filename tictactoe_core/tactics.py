@@ -0,0 +1,50 @@
+# Fast tactical pre-pass for moves that need no thinking.
+#
+# A move is forced when only one cell is left, when the AI can complete a
+# line right away, or when the opponent threatens to complete exactly one
+# cell's worth of lines next move. These are found with the precomputed win
+# masks for the board size, without searching or asking the model.
+
+from .bitboard import WIN_LENGTH, WIN_MASKS, iter_bits
+
+# How the reasoning spells out the line length
+LENGTH_WORDS = {3: "three", 4: "four", 5: "five", 6: "six", 7: "seven"}
+
+
+def completing_cells(bits, blockers, size, win_length=WIN_LENGTH):
+    # Empty cells that would complete a line for `bits`, given the other
+    # player's marks in `blockers`
+    cells = 0
+    for mask in WIN_MASKS[size, win_length]:
+        if blockers & mask:
+            continue
+        missing = mask & ~bits
+        # Exactly one cell of the line is missing
+        if missing and not missing & (missing - 1):
+            cells |= missing
+    return cells
+
+
+def forced_move(board, ai_marker):
+    # (move, reasoning) when the move is determined, otherwise None
+    size = board.size
+    win_length = board.win_length
+    ai = board.bits(ai_marker)
+    human = board.occupied_mask() & ~ai
+    human_marker = "O" if ai_marker == "X" else "X"
+    length = LENGTH_WORDS.get(win_length, str(win_length))
+
+    empty_cells = board.empty_cells()
+    if len(empty_cells) == 1:
+        return empty_cells[0], f"Only position {empty_cells[0]} is left."
+
+    wins = completing_cells(ai, human, size, win_length)
+    if wins:
+        move = next(iter_bits(wins))
+        return move, f"Position {move} completes {length} '{ai_marker}' in a row."
+
+    threats = list(iter_bits(completing_cells(human, ai, size, win_length)))
+    if len(threats) == 1:
+        return threats[0], f"Blocking position {threats[0]}, which would complete {length} '{human_marker}' in a row."
+
+    return None
@@ -0,0 +1,94 @@
+# Threat detection for k-in-a-row games.
+#
+# Patterns are named as in gomoku (five in a row) and scale with the win
+# length k of the board:
+#   four        k-1 marks in a line of k cells whose last cell is empty,
+#               so it wins next move unless blocked
+#   open four   k-1 marks in a row with an empty cell at both ends, which
+#               cannot be blocked any more
+#   open three  k-2 marks and one gap inside k+1 cells whose two ends are
+#               empty, so filling the gap makes an open four
+# The windows through each cell are built once per (size, win_length), so
+# threats_at() after a move looks at the same few windows on any board size.
+
+from collections import namedtuple
+
+from .bitboard import SizeTable, MARKERS, WIN_MASKS, CELL_MASKS, build_win_masks, iter_bits, popcount
+
+FOUR = "four"
+OPEN_FOUR = "open four"
+OPEN_THREE = "open three"
+
+# The kind of threat, whose it is, the cells of the pattern as a mask, and
+# the empty cells that carry it forward: the winning cell of a four, both
+# ends of an open four, the gap of an open three. The defender has to take
+# one of them (either end, for an open three).
+Threat = namedtuple("Threat", ["kind", "marker", "window", "moves"])
+
+
+def _build_open_windows(size, win_length):
+    # (window, ends, inside) masks for every run of win_length + 1 cells. The
+    # cell index grows along every direction, so the ends of a run are its
+    # lowest and highest bits.
+    windows = []
+    for window in build_win_masks(size, win_length + 1):
+        ends = (window & -window) | 1 << (window.bit_length() - 1)
+        windows.append((window, ends, window & ~ends))
+    return tuple(windows)
+
+
+def _build_cell_open_windows(size, win_length):
+    by_cell = [[] for _ in range(size * size)]
+    for entry in OPEN_WINDOWS[size, win_length]:
+        for index in iter_bits(entry[0]):
+            by_cell[index].append(entry)
+    return tuple(tuple(entries) for entries in by_cell)
+
+
+# Open windows by (size, win_length), and through each cell
+OPEN_WINDOWS = SizeTable(_build_open_windows)
+CELL_OPEN_WINDOWS = SizeTable(_build_cell_open_windows)
+
+
+def _fours(masks, mine, theirs, marker, win_length):
+    for mask in masks:
+        if not theirs & mask and popcount(mine & mask) == win_length - 1:
+            yield Threat(FOUR, marker, mask, tuple(iter_bits(mask & ~mine)))
+
+
+def _open_threats(windows, mine, theirs, marker, win_length):
+    for window, ends, inside in windows:
+        if theirs & window or mine & ends:
+            continue
+        marks = popcount(mine & inside)
+        if marks == win_length - 1:
+            yield Threat(OPEN_FOUR, marker, window, tuple(iter_bits(ends)))
+        elif marks == win_length - 2:
+            yield Threat(OPEN_THREE, marker, window, tuple(iter_bits(inside & ~mine)))
+
+
+def find_threats(board, marker):
+    # Every threat `marker` has on a BitBoard: fours, then open fours and
+    # open threes
+    size, win_length = board.size, board.win_length
+    mine = board.bits(marker)
+    theirs = board.occupied_mask() & ~mine
+    return (
+        list(_fours(WIN_MASKS[size, win_length], mine, theirs, marker, win_length)) +
+        list(_open_threats(OPEN_WINDOWS[size, win_length], mine, theirs, marker, win_length))
+    )
+
+
+def threats_at(board, index):
+    # The threats through `index` for the marker on it, such as those the
+    # last move made
+    marker = board[index]
+    if marker not in MARKERS:
+        return []
+    size, win_length = board.size, board.win_length
+    mine = board.bits(marker)
+    theirs = board.occupied_mask() & ~mine
+    return (
+        list(_fours(CELL_MASKS[size, win_length][index], mine, theirs, marker, win_length)) +
+        list(_open_threats(CELL_OPEN_WINDOWS[size, win_length][index], mine, theirs, marker, win_length))
+    )
@@ -0,0 +1,214 @@
+# Self-play tournaments between move strategies.
+#
+# Every pair of players meets on every board size, each taking X (who moves
+# first) in half of the games. Games are spread over a process pool and each
+# one is written as a JSON line; a summary of win and tie rates per player
+# and the overall games/sec is printed at the end. The "claude" player sends
+# the real move prompt to a Messages API endpoint, by default a local stub
+# server started for the run.
+#
+#     python -m tictactoe_core.tournament --players random,forced,search --sizes 3,4 --games 200
+#     python -m tictactoe_core.tournament --players search,claude --output results.jsonl
+#     python -m tictactoe_core.tournament --players forced,search --sizes 15 --win-length 5
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import permutations
+
+from .bitboard import WIN_LENGTH
+from .game import Game, TIE, other_marker
+from .mcts import find_mcts_move
+from .search import find_best_move
+from .tactics import forced_move
+
+DEFAULT_SEARCH_TIME = 0.05
+
+
+def random_player(board, marker, rng, settings):
+    return rng.choice(board.empty_cells())
+
+
+def forced_player(board, marker, rng, settings):
+    # Forced moves (last cell, win, single block), otherwise a random cell
+    forced = forced_move(board, marker)
+    if forced is not None:
+        return forced[0]
+    return random_player(board, marker, rng, settings)
+
+
+def search_player(board, marker, rng, settings):
+    return find_best_move(board, marker, settings["search_time"]).move
+
+
+def mcts_player(board, marker, rng, settings):
+    # One tree per game; the tournament already runs a game on every worker
+    return find_mcts_move(board, marker, settings["search_time"], seed=rng.randrange(1 << 30)).move
+
+
+# One Anthropic client per worker process and endpoint
+_clients = {}
+
+
+def claude_player(board, marker, rng, settings):
+    from . import claude_player as claude
+    url = settings["claude_url"]
+    client = _clients.get(url)
+    if client is None:
+        import anthropic
+        client = _clients[url] = anthropic.Anthropic(
+            api_key=os.getenv("ANTHROPIC_API_KEY", "stub"), base_url=url, max_retries=0
+        )
+    return claude.request_move(client, board, marker, other_marker(marker), settings["protocol"]).move
+
+
+PLAYERS = {
+    "random": random_player,
+    "forced": forced_player,
+    "search": search_player,
+    "mcts": mcts_player,
+    "claude": claude_player,
+}
+
+
+def play_game(spec):
+    # Play one game and return its record. A player that fails or returns an
+    # illegal move has a random move played for it, counted in "fallbacks".
+    size, x_name, o_name, seed, settings = spec
+    rng = random.Random(seed)
+    game = Game(size, first_player="X", win_length=settings.get("win_length", WIN_LENGTH))
+    names = {"X": x_name, "O": o_name}
+    fallbacks = {"X": 0, "O": 0}
+    moves = []
+    start = time.perf_counter()
+    while not game.game_over:
+        marker = game.current_player
+        try:
+            move = PLAYERS[names[marker]](game.board, marker, rng, settings)
+        except Exception:
+            move = None
+        if move is None or not game.make_move(move):
+            fallbacks[marker] += 1
+            move = random_player(game.board, marker, rng, settings)
+            game.make_move(move)
+        moves.append(move)
+    return {
+        "size": size,
+        "win_length": game.win_length,
+        "x": x_name,
+        "o": o_name,
+        "winner": game.winner,
+        "moves": moves,
+        "fallbacks": fallbacks,
+        "seed": seed,
+        "elapsed": time.perf_counter() - start,
+    }
+
+
+def schedule(players, sizes, games, seed, settings):
+    # Game specs for every size and ordered pair of players (self-play when
+    # there is only one), `games` per pairing split evenly between colours
+    pairings = list(permutations(players, 2)) or [(players[0], players[0])]
+    per_side = max(1, games // 2) if len(players) > 1 else games
+    specs = []
+    for size in sizes:
+        for x_name, o_name in pairings:
+            for _ in range(per_side):
+                specs.append((size, x_name, o_name, seed + len(specs), settings))
+    return specs
+
+
+def summarize(records):
+    # {(player, size): {"games", "wins", "losses", "ties"}}
+    table = defaultdict(lambda: {"games": 0, "wins": 0, "losses": 0, "ties": 0})
+    for record in records:
+        for marker, name in (("X", record["x"]), ("O", record["o"])):
+            row = table[name, record["size"]]
+            row["games"] += 1
+            if record["winner"] == TIE:
+                row["ties"] += 1
+            elif record["winner"] == marker:
+                row["wins"] += 1
+            else:
+                row["losses"] += 1
+    return table
+
+
+def print_summary(records, elapsed, out=sys.stdout):
+    print(f"{'player':<8} {'size':>4} {'games':>6} {'win':>6} {'tie':>6} {'loss':>6}", file=out)
+    for (name, size), row in sorted(summarize(records).items()):
+        games = row["games"]
+        print(
+            f"{name:<8} {size:>4} {games:>6} {row['wins'] / games:>6.1%} "
+            f"{row['ties'] / games:>6.1%} {row['losses'] / games:>6.1%}",
+            file=out
+        )
+    fallbacks = sum(sum(record["fallbacks"].values()) for record in records)
+    print(f"{len(records)} games in {elapsed:.1f}s ({len(records) / elapsed:.1f} games/sec), "
+          f"{fallbacks} fallback moves", file=out)
+
+
+def parse_list(text):
+    return [item.strip() for item in text.split(",") if item.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play a tournament between move strategies")
+    parser.add_argument("--players", type=parse_list, default=["random", "forced", "search"],
+                        help=f"comma-separated players from {', '.join(PLAYERS)}")
+    parser.add_argument("--sizes", type=lambda text: [int(size) for size in parse_list(text)], default=[3],
+                        help="comma-separated board sizes (default: 3)")
+    parser.add_argument("--games", type=int, default=100, help="games per pairing and size")
+    parser.add_argument("--win-length", type=int, default=WIN_LENGTH,
+                        help="marks in a row to win, capped at each board size (default: 3)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--output", help="JSONL file for the game records")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--search-time", type=float, default=DEFAULT_SEARCH_TIME,
+                        help="seconds per move for the search and mcts players")
+    parser.add_argument("--claude-url", help="Messages API endpoint for the claude player "
+                                              "(default: a local stub server)")
+    parser.add_argument("--protocol", choices=["tool", "text"], default="tool",
+                        help="how the claude player asks for its move")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.players if name not in PLAYERS]
+    if unknown:
+        parser.error(f"unknown players: {', '.join(unknown)}")
+
+    stub = None
+    claude_url = args.claude_url
+    if "claude" in args.players and claude_url is None:
+        from . import stub_server
+        stub = stub_server.start(seed=args.seed)
+        claude_url = stub.url
+
+    settings = {"search_time": args.search_time, "claude_url": claude_url, "protocol": args.protocol,
+                "win_length": args.win_length}
+    specs = schedule(args.players, args.sizes, args.games, args.seed, settings)
+
+    output = open(args.output, "w") if args.output else None
+    records = []
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            chunksize = max(1, len(specs) // (4 * (args.workers or 1)))
+            for record in executor.map(play_game, specs, chunksize=chunksize):
+                records.append(record)
+                if output is not None:
+                    output.write(json.dumps(record) + "\n")
+    finally:
+        if output is not None:
+            output.close()
+        if stub is not None:
+            stub.shutdown()
+    print_summary(records, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    sys.exit(main())